@@ -1,4 +1,6 @@
 import numpy as np
+import random
+from array import array
 
 # GLOBAL VARIABLES
 EMPTY = 0       # Empty space board value
@@ -7,6 +9,12 @@ PLAYER2 = -1    # Second player board value
 
 BOARD_SIZE = 8  # Size of the board
 NUM_PIECES = 8  # Number of pieces each player is allowed to place of their own color
+BOARD_CELLS = BOARD_SIZE * BOARD_SIZE   # Number of squares; square index of (r, c) is r * BOARD_SIZE + c
+
+# Directions pieces are pushed in
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+# One direction per line type (row, column, both diagonals) for 3 in a row
+LINE_DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
 
 ##################
 
@@ -35,6 +43,105 @@ def chess_notation_to_array(notation: str) -> list[int]:
     # Single move (2 characters) or full move (4 characters)
     return to_array(notation[:2]) + (to_array(notation[2:]) if len(notation) == 4 else [])
 
+class TorusGeometry:
+    """
+    Coordinate tables for a size x size torus, built once so the rules, agents and
+    evaluation never recompute wrapped coordinates in their inner loops.
+    Squares are indexed r * size + c and directions follow DIRECTIONS / LINE_DIRECTIONS.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.cells = size * size
+        center = size // 2
+
+        def square(r, c):
+            return ((r + size) % size) * size + (c + size) % size
+
+        self.coords = [divmod(sq, size) for sq in range(self.cells)]     # (r, c) of every square
+        self.bits = [1 << sq for sq in range(self.cells)]                # Bitboard mask of every square
+
+        # neighbors[sq][d] / second_neighbors[sq][d] are the squares 1 and 2 steps from sq in DIRECTIONS[d]
+        self.neighbors = [[square(r + dr, c + dc) for dr, dc in DIRECTIONS] for r, c in self.coords]
+        self.second_neighbors = [[square(r + 2 * dr, c + 2 * dc) for dr, dc in DIRECTIONS] for r, c in self.coords]
+
+        # Every wrapped 3-cell winning line, as squares and as a bitboard mask
+        self.lines = []
+        for r, c in self.coords:
+            for dr, dc in LINE_DIRECTIONS:
+                self.lines.append(tuple(square(r + i * dr, c + i * dc) for i in range(3)))
+        self.line_masks = [sum(1 << sq for sq in line) for line in self.lines]
+
+        # Indices into self.lines of the lines that pass through each square (3 per line direction)
+        self.lines_through = [[] for _ in range(self.cells)]
+        for i, line in enumerate(self.lines):
+            for sq in line:
+                self.lines_through[sq].append(i)
+        self.line_masks_through = [[self.line_masks[i] for i in lines] for lines in self.lines_through]
+        # line_positions[sq] lists (index into self.lines, position of sq in that line) for the lines through sq
+        self.line_positions = [[(i, self.lines[i].index(sq)) for i in lines] for sq, lines in enumerate(self.lines_through)]
+
+        # windows[sq][k] are the 5 squares at offsets -2..2 from sq along LINE_DIRECTIONS[k]
+        self.windows = [[[square(r + i * dr, c + i * dc) for i in range(-2, 3)] for dr, dc in LINE_DIRECTIONS]
+                        for r, c in self.coords]
+
+        # Centrality weight of every square, highest in the middle of the board
+        self.weights = [center - max(abs(r - center), abs(c - center)) for r, c in self.coords]
+
+GEOMETRY = TorusGeometry(BOARD_SIZE)
+
+# ZOBRIST HASHING
+# Fixed seed so every process (player servers, workers, book builder) agrees on position keys
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_PIECES = {
+    PLAYER1: [_zobrist_rng.getrandbits(64) for _ in range(BOARD_CELLS)],
+    PLAYER2: [_zobrist_rng.getrandbits(64) for _ in range(BOARD_CELLS)],
+}
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)                                         # XORed in when PLAYER2 is to move
+ZOBRIST_P1_PLACED = [_zobrist_rng.getrandbits(64) for _ in range(NUM_PIECES + 1)]   # Indexed by p1_pieces
+ZOBRIST_P2_PLACED = [_zobrist_rng.getrandbits(64) for _ in range(NUM_PIECES + 1)]   # Indexed by p2_pieces
+
+def zobrist_key(board_key, current_player, p1_pieces, p2_pieces):
+    """
+    Combine the Zobrist key of the board contents with the side to move and the placement counters.
+    """
+    key = board_key ^ ZOBRIST_P1_PLACED[p1_pieces] ^ ZOBRIST_P2_PLACED[p2_pieces]
+    if current_player == PLAYER2:
+        key ^= ZOBRIST_SIDE
+    return key
+
+# PATTERN EVALUATION
+# Every 3-cell line is a base-3 number whose digit i is the i-th square of the line (0 empty, 1 Player1,
+# 2 Player2), and that number indexes LINE_PATTERN_SCORES. The evaluation of a position is the sum over all
+# lines plus a centrality score per piece, from Player1's point of view; BitboardGame keeps it up to date
+# by adjusting only the lines through each square that changes.
+PATTERN_THREE = 5000        # 3 in a row
+PATTERN_OPEN_TWO = 500      # 2 pieces and an empty square: the empty square wins
+PATTERN_BLOCKED_TWO = 20    # 2 pieces and an opponent piece
+PATTERN_OPEN_ONE = 10       # 1 piece and 2 empty squares
+PIECE_WEIGHT = 3            # Times GEOMETRY.weights of the piece's square
+LINE_DIGITS = {EMPTY: 0, PLAYER1: 1, PLAYER2: 2}
+
+def _line_pattern_score(index):
+    """
+    Score of a line pattern from Player1's point of view.
+    """
+    digits = [(index // 3 ** i) % 3 for i in range(3)]
+    p1, p2 = digits.count(1), digits.count(2)
+    if p2 == 0:
+        return [0, PATTERN_OPEN_ONE, PATTERN_OPEN_TWO, PATTERN_THREE][p1]
+    if p1 == 0:
+        return -[0, PATTERN_OPEN_ONE, PATTERN_OPEN_TWO, PATTERN_THREE][p2]
+    if p1 == 2:
+        return PATTERN_BLOCKED_TWO
+    if p2 == 2:
+        return -PATTERN_BLOCKED_TWO
+    return 0
+
+LINE_PATTERN_SCORES = [_line_pattern_score(index) for index in range(27)]
+PIECE_SCORES = [PIECE_WEIGHT * weight for weight in GEOMETRY.weights]
+# LINE_STEPS[sq] lists (line index, 3 ** position of sq in the line) for the 12 lines through sq
+LINE_STEPS = [[(line, 3 ** position) for line, position in positions] for positions in GEOMETRY.line_positions]
+
 class Game:
     def __init__(self):
         self.board = np.full((BOARD_SIZE, BOARD_SIZE), 0)   # Board represented as a np array of empty spaces (0s)
@@ -104,115 +211,50 @@ class Game:
         return True
      
     # Handles the PLACEMENT of the checker
+    # Returns the squares (r * BOARD_SIZE + c) whose contents changed
     def place_checker(self, r, c):
         self.board[r][c] = self.current_player
         if self.current_player == PLAYER1:
             self.p1_pieces += 1
         else:
             self.p2_pieces += 1
-        self.push_neighbors(r, c)
+        return [r * BOARD_SIZE + c] + self.push_neighbors(r, c)
 
     # Handles the MOVEMENT of the checker
+    # Returns the squares (r * BOARD_SIZE + c) whose contents changed
     def move_checker(self, r0, c0, r1, c1):
         self.board[r0][c0] = EMPTY
         self.board[r1][c1] = self.current_player
-        self.push_neighbors(r1, c1)
+        return [r0 * BOARD_SIZE + c0, r1 * BOARD_SIZE + c1] + self.push_neighbors(r1, c1)
 
     # Push mechanic - Pushes all pieces away
+    # Returns the squares that pushed pieces left and landed on
     def push_neighbors(self, r0, c0):
-        dirs = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
-        for dr, dc in dirs:
-            # (r1, c1) is a 1-tile (immediate) neighbor of (r0, c0) in the direction (dr, dc)
-            r1, c1 = _torus(r0 + dr, c0 + dc)
+        changed = []
+        sq0 = r0 * BOARD_SIZE + c0
+        for sq1, sq2 in zip(GEOMETRY.neighbors[sq0], GEOMETRY.second_neighbors[sq0]):
+            # (r1, c1) is a 1-tile (immediate) neighbor of (r0, c0) in each direction
+            r1, c1 = GEOMETRY.coords[sq1]
             if self.board[r1][c1] != EMPTY:
-                # (r2, c2) is a 2-tile (secondary) neighbor of (r0, c0) in the direction (dr, dc)
-                r2, c2 = _torus(r1 + dr, c1 + dc)
+                # (r2, c2) is a 2-tile (secondary) neighbor of (r0, c0) in the same direction
+                r2, c2 = GEOMETRY.coords[sq2]
                 if self.board[r2][c2] == EMPTY:
                     self.board[r2][c2], self.board[r1][c1] = self.board[r1][c1], self.board[r2][c2]
+                    changed.append(sq1)
+                    changed.append(sq2)
+        return changed
 
-    # checks for a winner - 3 in a row
+    # checks for a winner - 3 in a row - on every wrapped line of the shared geometry tables
     def check_winner(self):
-        player1_wins = False
-        player2_wins = False
-        # check rows
-        for row in range(0, BOARD_SIZE):
-            cnt = 0
-            tile = EMPTY
-            for col in range(-2, BOARD_SIZE+2):
-                r, c = _torus(row, col)
-                curr_tile = self.board[r][c]
-                if curr_tile == EMPTY:
-                    cnt = 0
-                elif curr_tile != tile:
-                    cnt = 1
-                else:
-                    cnt += 1
-                    if (cnt == 3):
-                        if tile == PLAYER1:
-                            player1_wins = True
-                        elif tile == PLAYER2:
-                            player2_wins = True
-                tile = self.board[r][c]
-
-        # check cols
-        for col in range(0, BOARD_SIZE):
-            cnt = 0
-            tile = EMPTY
-            for row in range(-2, BOARD_SIZE+2):
-                r, c = _torus(row, col)
-                curr_tile = self.board[r][c]
-                if curr_tile == EMPTY:
-                    cnt = 0
-                elif curr_tile != tile:
-                    cnt = 1
-                else:
-                    cnt += 1
-                    if (cnt == 3):
-                        if tile == PLAYER1:
-                            player1_wins = True
-                        elif tile == PLAYER2:
-                            player2_wins = True
-                tile = self.board[r][c]
-
-        # check negative diagonals
-        for col_start in range(0, BOARD_SIZE):
-            cnt = 0
-            tile = EMPTY
-            for i in range(-2, BOARD_SIZE+2):
-                r, c = _torus(i, col_start + i)
-                curr_tile = self.board[r][c]
-                if curr_tile == EMPTY:
-                    cnt = 0
-                elif curr_tile != tile:
-                    cnt = 1
-                else:
-                    cnt += 1
-                    if (cnt == 3):
-                        if tile == PLAYER1:
-                            player1_wins = True
-                        elif tile == PLAYER2:
-                            player2_wins = True
-                tile = self.board[r][c]
-
-        # check positive diagonals
-        for col_start in range(0, BOARD_SIZE):
-            cnt = 0
-            tile = EMPTY
-            for i in range(-2, BOARD_SIZE+2):
-                r, c = _torus(i, col_start - i)
-                curr_tile = self.board[r][c]
-                if curr_tile == EMPTY:
-                    cnt = 0
-                elif curr_tile != tile:
-                    cnt = 1
-                else:
-                    cnt += 1
-                    if (cnt == 3):
-                        if tile == PLAYER1:
-                            player1_wins = True
-                        elif tile == PLAYER2:
-                            player2_wins = True
-                tile = self.board[r][c]
+        p1_bits = 0
+        p2_bits = 0
+        for sq, (r, c) in enumerate(GEOMETRY.coords):
+            if self.board[r][c] == PLAYER1:
+                p1_bits |= GEOMETRY.bits[sq]
+            elif self.board[r][c] == PLAYER2:
+                p2_bits |= GEOMETRY.bits[sq]
+        player1_wins = any(p1_bits & line == line for line in GEOMETRY.line_masks)
+        player2_wins = any(p2_bits & line == line for line in GEOMETRY.line_masks)
 
         if player1_wins and player2_wins:
             return self.current_player
@@ -224,6 +266,48 @@ class Game:
 
         return EMPTY # no one has won the game
 
+    # 64-bit Zobrist key of the position (board, side to move and pieces placed)
+    @property
+    def key(self):
+        board_key = 0
+        for sq, (r, c) in enumerate(GEOMETRY.coords):
+            if self.board[r][c] != EMPTY:
+                board_key ^= ZOBRIST_PIECES[self.board[r][c]][sq]
+        return zobrist_key(board_key, self.current_player, self.p1_pieces, self.p2_pieces)
+
+    # checks for a winner only on the lines through the changed squares
+    # Assumes nobody had 3 in a row before those squares changed; same result as check_winner otherwise
+    def check_winner_at(self, squares):
+        player1_wins = False
+        player2_wins = False
+        for sq in squares:
+            row, col = GEOMETRY.coords[sq]
+            tile = self.board[row][col]
+            if tile == EMPTY:
+                continue
+            for window in GEOMETRY.windows[sq]:
+                cnt = 0
+                for r, c in (GEOMETRY.coords[w] for w in window):
+                    if self.board[r][c] == tile:
+                        cnt += 1
+                        if cnt == 3:
+                            if tile == PLAYER1:
+                                player1_wins = True
+                            else:
+                                player2_wins = True
+                            break
+                    else:
+                        cnt = 0
+
+        if player1_wins and player2_wins:
+            return self.current_player
+        elif player1_wins:
+            return PLAYER1
+        elif player2_wins:
+            return PLAYER2
+
+        return EMPTY
+
     # Play the game
     def play(self):
         while True:
@@ -249,7 +333,7 @@ class Game:
                     print("Invalid move. Try again.")
                     continue
 
-                self.place_checker(row, col)
+                changed = self.place_checker(row, col)
             else:
                 print("Move an existing piece:")
                 try:
@@ -262,11 +346,11 @@ class Game:
                     print("Invalid move. Try again.")
                     continue
 
-                self.move_checker(r0, c0, r1, c1)
+                changed = self.move_checker(r0, c0, r1, c1)
 
             self.turn_count += 1
 
-            winner = self.check_winner()
+            winner = self.check_winner_at(changed)
             if winner != EMPTY:
                 self.display_board()
                 print(f"{'White' if winner == PLAYER1 else 'Black'} wins!")
@@ -274,6 +358,797 @@ class Game:
 
             self.current_player = PLAYER2 if self.current_player == PLAYER1 else PLAYER1
 
+# BITBOARD BACKEND
+# Each player's pieces are kept as the set bits of one integer, bit i being square i.
+FULL_MASK = (1 << BOARD_CELLS) - 1
+
+# _LOW_COLS[k] has the bits of columns 0..k-1 set in every row
+_LOW_COLS = [sum(((1 << k) - 1) << (r * BOARD_SIZE) for r in range(BOARD_SIZE)) for k in range(BOARD_SIZE)]
+
+def _shift(bits, dr, dc):
+    """
+    Move every set bit by (dr, dc) on the torus.
+    """
+    k = dc % BOARD_SIZE
+    if k:
+        low = _LOW_COLS[k]
+        bits = (((bits << k) & ~low) | ((bits >> (BOARD_SIZE - k)) & low)) & FULL_MASK
+    k = (dr % BOARD_SIZE) * BOARD_SIZE
+    if k:
+        bits = ((bits << k) | (bits >> (BOARD_CELLS - k))) & FULL_MASK
+    return bits
+
+def has_three_in_a_row(bits):
+    """
+    True if the set bits contain 3 in a row along a row, column or diagonal of the torus.
+    """
+    for dr, dc in LINE_DIRECTIONS:
+        step = _shift(bits, dr, dc)
+        if bits & step & _shift(step, dr, dc):
+            return True
+    return False
+
+def threat_squares(bits, empty):
+    """
+    Empty squares that would complete 3 in a row with two of the set bits.
+    """
+    threats = 0
+    for dr, dc in LINE_DIRECTIONS:
+        ahead = _shift(bits, -dr, -dc)          # squares whose next square along the line is set
+        behind = _shift(bits, dr, dc)           # squares whose previous square is set
+        threats |= ahead & _shift(ahead, -dr, -dc)      # X X after
+        threats |= behind & _shift(behind, dr, dc)      # X X before
+        threats |= ahead & behind                       # X _ X
+    return threats & empty
+
+def iter_bits(bits):
+    """
+    Yield the square index of every set bit, lowest first.
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+class BitboardGame(Game):
+    """
+    Drop-in Game backend that keeps each player's pieces in a 64-bit integer.
+    Placements, moves, pushes and the winner check are shift/mask operations; `board`
+    is still available as a numpy array for display and serialization.
+    The Zobrist key of the board contents and the pattern evaluation are updated with every changed square.
+    """
+    def __init__(self):
+        self.p1_bits = 0                                    # Squares occupied by Player1
+        self.p2_bits = 0                                    # Squares occupied by Player2
+        self.board_key = 0                                  # Zobrist key of the board contents alone
+        self.current_player = PLAYER1                       # Player that has the current move
+        self.turn_count = 0                                 # Number of turns elapsed in the game
+        self.p1_pieces = 0                                  # Number of pieces that Player1 has placed on the board
+        self.p2_pieces = 0                                  # Number of pieces that Player2 has placed on the board
+        self.undo_stack = []                                # One record per make_move, popped by unmake_move
+        self.line_codes = [0] * len(GEOMETRY.lines)         # Base-3 pattern index of every line
+        self.eval_score = 0                                 # Pattern evaluation from Player1's point of view
+
+    # Board as a numpy array, built from the bitboards
+    @property
+    def board(self):
+        board = np.full((BOARD_SIZE, BOARD_SIZE), 0)
+        for sq in iter_bits(self.p1_bits):
+            board[sq // BOARD_SIZE][sq % BOARD_SIZE] = PLAYER1
+        for sq in iter_bits(self.p2_bits):
+            board[sq // BOARD_SIZE][sq % BOARD_SIZE] = PLAYER2
+        return board
+
+    @board.setter
+    def board(self, board):
+        self.p1_bits = 0
+        self.p2_bits = 0
+        self.board_key = 0
+        self.line_codes = [0] * len(GEOMETRY.lines)
+        self.eval_score = 0
+        for sq, (r, c) in enumerate(GEOMETRY.coords):
+            if board[r][c] == PLAYER1:
+                self.p1_bits |= GEOMETRY.bits[sq]
+                self.board_key ^= ZOBRIST_PIECES[PLAYER1][sq]
+                self._update_lines(sq, EMPTY, PLAYER1)
+            elif board[r][c] == PLAYER2:
+                self.p2_bits |= GEOMETRY.bits[sq]
+                self.board_key ^= ZOBRIST_PIECES[PLAYER2][sq]
+                self._update_lines(sq, EMPTY, PLAYER2)
+
+    # 64-bit Zobrist key of the position; only the side and counters are folded in here
+    @property
+    def key(self):
+        return zobrist_key(self.board_key, self.current_player, self.p1_pieces, self.p2_pieces)
+
+    # Returns an independent copy of the game
+    def copy(self):
+        game = BitboardGame.__new__(BitboardGame)
+        game.p1_bits = self.p1_bits
+        game.p2_bits = self.p2_bits
+        game.board_key = self.board_key
+        game.current_player = self.current_player
+        game.turn_count = self.turn_count
+        game.p1_pieces = self.p1_pieces
+        game.p2_pieces = self.p2_pieces
+        game.undo_stack = []
+        game.line_codes = self.line_codes[:]
+        game.eval_score = self.eval_score
+        return game
+
+    # Returns the value of the tile at (r, c)
+    def get(self, r, c):
+        bit = 1 << (r * BOARD_SIZE + c)
+        if self.p1_bits & bit:
+            return PLAYER1
+        if self.p2_bits & bit:
+            return PLAYER2
+        return EMPTY
+
+    # Returns the value of the tile on square sq
+    def get_square(self, sq):
+        bit = GEOMETRY.bits[sq]
+        if self.p1_bits & bit:
+            return PLAYER1
+        if self.p2_bits & bit:
+            return PLAYER2
+        return EMPTY
+
+    # Bitboard of the current player's pieces
+    def own_bits(self):
+        return self.p1_bits if self.current_player == PLAYER1 else self.p2_bits
+
+    # Bitboard of every empty square
+    def empty_bits(self):
+        return ~(self.p1_bits | self.p2_bits) & FULL_MASK
+
+    def is_valid_placement(self, row, col):
+        if self.current_player == PLAYER1 and self.p1_pieces >= NUM_PIECES:
+            print("White has moved all pieces. Must move an existing piece")
+            return False
+        if self.current_player == PLAYER2 and self.p2_pieces >= NUM_PIECES:
+            print("Black has moved all pieces. Must move an existing piece")
+            return False
+        return 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE and self.get(row, col) == EMPTY
+
+    def is_valid_move(self, r0, c0, r1, c1):
+        # in bounds
+        if not (0 <= r0 < BOARD_SIZE and 0 <= c0 < BOARD_SIZE and
+                0 <= r1 < BOARD_SIZE and 0 <= c1 < BOARD_SIZE):
+            return False
+
+        # is your piece
+        if self.get(r0, c0) != self.current_player:
+            print("You can only move your own pieces!")
+            return False
+
+        # is an empty spot
+        if self.get(r1, c1) != EMPTY:
+            print("Destination square must be empty!")
+            return False
+
+        return True
+
+    def place_checker(self, r, c):
+        sq = r * BOARD_SIZE + c
+        if self.current_player == PLAYER1:
+            self.p1_bits |= GEOMETRY.bits[sq]
+            self.p1_pieces += 1
+        else:
+            self.p2_bits |= GEOMETRY.bits[sq]
+            self.p2_pieces += 1
+        self.board_key ^= ZOBRIST_PIECES[self.current_player][sq]
+        self._update_lines(sq, EMPTY, self.current_player)
+        return [sq] + self.push_neighbors(r, c)
+
+    def move_checker(self, r0, c0, r1, c1):
+        sq0 = r0 * BOARD_SIZE + c0
+        sq1 = r1 * BOARD_SIZE + c1
+        if self.current_player == PLAYER1:
+            self.p1_bits ^= GEOMETRY.bits[sq0] | GEOMETRY.bits[sq1]
+        else:
+            self.p2_bits ^= GEOMETRY.bits[sq0] | GEOMETRY.bits[sq1]
+        zobrist = ZOBRIST_PIECES[self.current_player]
+        self.board_key ^= zobrist[sq0] ^ zobrist[sq1]
+        self._update_lines(sq0, self.current_player, EMPTY)
+        self._update_lines(sq1, EMPTY, self.current_player)
+        return [sq0, sq1] + self.push_neighbors(r1, c1)
+
+    def push_neighbors(self, r0, c0):
+        changed = []
+        sq0 = r0 * BOARD_SIZE + c0
+        bits = GEOMETRY.bits
+        for sq1, sq2 in zip(GEOMETRY.neighbors[sq0], GEOMETRY.second_neighbors[sq0]):
+            # sq1 is the immediate neighbor and sq2 the secondary neighbor in each direction
+            bit1 = bits[sq1]
+            if (self.p1_bits | self.p2_bits) & bit1:
+                bit2 = bits[sq2]
+                if not (self.p1_bits | self.p2_bits) & bit2:
+                    if self.p1_bits & bit1:
+                        self.p1_bits ^= bit1 | bit2
+                        piece = PLAYER1
+                    else:
+                        self.p2_bits ^= bit1 | bit2
+                        piece = PLAYER2
+                    zobrist = ZOBRIST_PIECES[piece]
+                    self.board_key ^= zobrist[sq1] ^ zobrist[sq2]
+                    self._update_lines(sq1, piece, EMPTY)
+                    self._update_lines(sq2, EMPTY, piece)
+                    changed.append(sq1)
+                    changed.append(sq2)
+        return changed
+
+    def check_winner(self):
+        player1_wins = has_three_in_a_row(self.p1_bits)
+        player2_wins = has_three_in_a_row(self.p2_bits)
+        if player1_wins and player2_wins:
+            return self.current_player
+        # If only one player has 3 in a row, they win
+        elif player1_wins:
+            return PLAYER1
+        elif player2_wins:
+            return PLAYER2
+
+        return EMPTY # no one has won the game
+
+    # mover is the player who made the changes, current_player unless the turn was already passed
+    def check_winner_at(self, squares, mover=None):
+        player1_wins = False
+        player2_wins = False
+        p1_bits = self.p1_bits
+        p2_bits = self.p2_bits
+        for sq in squares:
+            bit = GEOMETRY.bits[sq]
+            if p1_bits & bit:
+                if not player1_wins:
+                    for line in GEOMETRY.line_masks_through[sq]:
+                        if p1_bits & line == line:
+                            player1_wins = True
+                            break
+            elif p2_bits & bit:
+                if not player2_wins:
+                    for line in GEOMETRY.line_masks_through[sq]:
+                        if p2_bits & line == line:
+                            player2_wins = True
+                            break
+
+        if player1_wins and player2_wins:
+            return self.current_player if mover is None else mover
+        elif player1_wins:
+            return PLAYER1
+        elif player2_wins:
+            return PLAYER2
+
+        return EMPTY
+
+    # Plays a placement (r, c) or movement (r0, c0, r1, c1) for the current player and passes the turn
+    # Returns the changed squares; unmake_move() restores the position exactly. turn_count is left alone.
+    def make_move(self, move):
+        p1_pieces = self.p1_pieces
+        p2_pieces = self.p2_pieces
+        if len(move) == 2:
+            source = None
+            landing = move[0] * BOARD_SIZE + move[1]
+            changed = self.place_checker(move[0], move[1])
+            pushed = changed[1:]
+        else:
+            source = move[0] * BOARD_SIZE + move[1]
+            landing = move[2] * BOARD_SIZE + move[3]
+            changed = self.move_checker(move[0], move[1], move[2], move[3])
+            pushed = changed[2:]
+        self.undo_stack.append((landing, source, pushed, p1_pieces, p2_pieces))
+        self.current_player = -self.current_player
+        return changed
+
+    # Passes the turn without moving (the null move of null-move pruning); unmake_move() takes it back
+    def make_null_move(self):
+        self.undo_stack.append((None, None, (), self.p1_pieces, self.p2_pieces))
+        self.current_player = -self.current_player
+
+    # Takes back the last make_move or make_null_move
+    def unmake_move(self):
+        landing, source, pushed, p1_pieces, p2_pieces = self.undo_stack.pop()
+        self.current_player = -self.current_player
+        if landing is None:
+            return
+        # pushed holds (from, to) square pairs; undo them last to first
+        for i in range(len(pushed) - 2, -1, -2):
+            self._relocate(pushed[i + 1], pushed[i])
+        if source is None:
+            self._relocate(landing, None)
+        else:
+            self._relocate(landing, source)
+        self.p1_pieces = p1_pieces
+        self.p2_pieces = p2_pieces
+
+    # Moves the piece on square sq0 to sq1, or removes it when sq1 is None
+    def _relocate(self, sq0, sq1):
+        bits = GEOMETRY.bits[sq0] if sq1 is None else GEOMETRY.bits[sq0] | GEOMETRY.bits[sq1]
+        if self.p1_bits & GEOMETRY.bits[sq0]:
+            self.p1_bits ^= bits
+            piece = PLAYER1
+        else:
+            self.p2_bits ^= bits
+            piece = PLAYER2
+        zobrist = ZOBRIST_PIECES[piece]
+        self.board_key ^= zobrist[sq0] if sq1 is None else zobrist[sq0] ^ zobrist[sq1]
+        self._update_lines(sq0, piece, EMPTY)
+        if sq1 is not None:
+            self._update_lines(sq1, EMPTY, piece)
+
+    # Adjusts the line codes and the pattern evaluation for square sq changing from old to new
+    def _update_lines(self, sq, old, new):
+        digit = LINE_DIGITS[new] - LINE_DIGITS[old]
+        codes = self.line_codes
+        score = self.eval_score + PIECE_SCORES[sq] * (new - old)
+        for line, step in LINE_STEPS[sq]:
+            code = codes[line]
+            codes[line] = code + digit * step
+            score += LINE_PATTERN_SCORES[code + digit * step] - LINE_PATTERN_SCORES[code]
+        self.eval_score = score
+
+# MOVE GENERATION
+# Moves as small integers: a movement is source * BOARD_CELLS + landing and a placement is PLACEMENT + landing,
+# so every move fits in an unsigned 16-bit array. MOVE_TUPLES[code] is the (r0, c0, r1, c1) / (r, c) tuple.
+PLACEMENT = BOARD_CELLS * BOARD_CELLS
+MOVE_TUPLES = ([GEOMETRY.coords[code // BOARD_CELLS] + GEOMETRY.coords[code % BOARD_CELLS] for code in range(PLACEMENT)]
+               + [GEOMETRY.coords[sq] for sq in range(BOARD_CELLS)])
+
+# Stages of generate_stages, in the order they are produced
+STAGE_WINS = 0      # Moves that complete 3 in a row for the mover, pushes included (winning_moves)
+STAGE_BLOCKS = 1    # Moves landing on a square that would complete the opponent's 3 in a row
+STAGE_NEAR = 2      # Moves landing next to a piece
+STAGE_REST = 3      # Everything else
+
+def encode_move(move):
+    """
+    Integer code of a placement (r, c) or movement (r0, c0, r1, c1).
+    """
+    if len(move) == 2:
+        return PLACEMENT + move[0] * BOARD_SIZE + move[1]
+    return (move[0] * BOARD_SIZE + move[1]) * BOARD_CELLS + move[2] * BOARD_SIZE + move[3]
+
+def decode_move(code):
+    """
+    Tuple form of a move code.
+    """
+    return MOVE_TUPLES[code]
+
+def neighborhood(bits):
+    """
+    Squares next to any set square, in any of the 8 directions.
+    """
+    result = 0
+    for dr, dc in DIRECTIONS:
+        result |= _shift(bits, dr, dc)
+    return result
+
+def _sources(game):
+    """
+    Squares the side to move can move from, or None while it is still placing pieces.
+    """
+    pieces = game.p1_pieces if game.current_player == PLAYER1 else game.p2_pieces
+    return None if pieces < NUM_PIECES else list(iter_bits(game.own_bits()))
+
+def _codes(sources, landings):
+    if sources is None:
+        return array('H', [PLACEMENT + landing for landing in iter_bits(landings)])
+    landings = list(iter_bits(landings))
+    return array('H', [source * BOARD_CELLS + landing for source in sources for landing in landings])
+
+def legal_moves(game):
+    """
+    Every legal move of the side to move, as an array of move codes.
+    """
+    return _codes(_sources(game), game.empty_bits())
+
+def move_is_legal(game, code):
+    """
+    True if the move code is legal for the side to move (used for moves from tables, e.g. the TT move).
+    """
+    sources = _sources(game)
+    if code >= PLACEMENT:
+        return sources is None and bool(game.empty_bits() & GEOMETRY.bits[code - PLACEMENT])
+    source, landing = divmod(code, BOARD_CELLS)
+    return sources is not None and bool(game.own_bits() & GEOMETRY.bits[source]) and bool(game.empty_bits() & GEOMETRY.bits[landing])
+
+def generate_stages(game, wins=None):
+    """
+    Yields (stage, array of move codes) for STAGE_WINS, STAGE_BLOCKS, STAGE_NEAR and STAGE_REST in that order.
+    Every legal move is in exactly one stage, and a stage is only worked out when the caller asks for it,
+    so a search that cuts off early never generates the later stages. wins can pass winning_moves(game)
+    when the caller has already worked it out.
+    """
+    player = game.current_player
+    own = game.own_bits()
+    opp = game.p2_bits if player == PLAYER1 else game.p1_bits
+    empty = game.empty_bits()
+    sources = _sources(game)
+
+    if wins is None:
+        wins = winning_moves(game)
+    yield STAGE_WINS, wins
+
+    won = set(wins)
+    blocks = threat_squares(opp, empty)
+    yield STAGE_BLOCKS, array('H', [code for code in _codes(sources, blocks) if code not in won])
+    near = neighborhood(own | opp) & empty & ~blocks
+    yield STAGE_NEAR, array('H', [code for code in _codes(sources, near) if code not in won])
+    yield STAGE_REST, array('H', [code for code in _codes(sources, empty & ~near & ~blocks) if code not in won])
+
+def generate_moves(game):
+    """
+    Move codes of the side to move, lazily and stage by stage (see generate_stages).
+    """
+    for _, codes in generate_stages(game):
+        yield from codes
+
+# THREAT DETECTION
+# Immediate wins worked out on the bitboards alone. A move completes 3 in a row either with the landing
+# piece (a threat square) or with one of the mover's pieces pushed two squares on from the landing, so
+# only those landings are played out, and a play-out is a few mask operations instead of make/unmake.
+
+# _PUSH_TARGETS[sq] has the squares a landing on sq can push a piece onto
+_PUSH_TARGETS = [sum(GEOMETRY.bits[s] for s in GEOMETRY.second_neighbors[sq]) for sq in range(BOARD_CELLS)]
+# _PUSH_AREA[sq] has the squares whose contents decide the pushes of a landing on sq
+_PUSH_AREA = [GEOMETRY.bits[sq] | neighborhood(GEOMETRY.bits[sq]) | _PUSH_TARGETS[sq] for sq in range(BOARD_CELLS)]
+
+def play_bits(p1_bits, p2_bits, player, source, landing):
+    """
+    (p1_bits, p2_bits, winner) after player moves from source (None for a placement) to landing,
+    with the rules of BitboardGame: pushes in DIRECTIONS order and simultaneous lines won by the mover.
+    """
+    bits = GEOMETRY.bits
+    move_bits = bits[landing] if source is None else bits[landing] | bits[source]
+    if player == PLAYER1:
+        p1_bits ^= move_bits
+    else:
+        p2_bits ^= move_bits
+    changed = [landing]
+    for sq1, sq2 in zip(GEOMETRY.neighbors[landing], GEOMETRY.second_neighbors[landing]):
+        bit1, bit2 = bits[sq1], bits[sq2]
+        occupied = p1_bits | p2_bits
+        if occupied & bit1 and not occupied & bit2:
+            if p1_bits & bit1:
+                p1_bits ^= bit1 | bit2
+            else:
+                p2_bits ^= bit1 | bit2
+            changed.append(sq2)
+
+    p1_wins = p2_wins = False
+    for sq in changed:
+        for mask in GEOMETRY.line_masks_through[sq]:
+            if p1_bits & mask == mask:
+                p1_wins = True
+            if p2_bits & mask == mask:
+                p2_wins = True
+    if p1_wins and p2_wins:
+        return p1_bits, p2_bits, player
+    if p1_wins:
+        return p1_bits, p2_bits, PLAYER1
+    if p2_wins:
+        return p1_bits, p2_bits, PLAYER2
+    return p1_bits, p2_bits, EMPTY
+
+# _AXIS[d] is the index into LINE_DIRECTIONS of the line DIRECTIONS[d] runs along
+_AXIS = [LINE_DIRECTIONS.index((dr, dc) if (dr, dc) in LINE_DIRECTIONS else (-dr, -dc)) for dr, dc in DIRECTIONS]
+# Pairs (d, e) of DIRECTIONS indices whose second squares from a landing are the ends of a line, with the
+# square one step along d and one along e in the middle (d - e is a single step along a line)
+_PUSH_PAIRS = [(d, e) for d in range(len(DIRECTIONS)) for e in range(d + 1, len(DIRECTIONS))
+               if max(abs(DIRECTIONS[d][0] - DIRECTIONS[e][0]), abs(DIRECTIONS[d][1] - DIRECTIONS[e][1])) == 1]
+
+def _win_landings(own, empty, vacated):
+    """
+    Squares a move of the owner of own could win on: the threat squares, and the landings next to one of
+    own pieces that would push it onto a square completing a line with pieces that can be there after the move.
+    vacated is the squares that may be emptied by the move (own pieces, once every piece is placed).
+
+    Everything is worked out for all squares at once with shifts, direction by direction. A pushed piece
+    can complete a line with two own pieces that does not run through the square it left, or with another
+    piece pushed by the same landing, which only happens for a line whose ends are both pushed onto and
+    whose middle is an own piece.
+    """
+    # Squares completing a line with two own pieces, along each line direction
+    completes = []
+    for dr, dc in LINE_DIRECTIONS:
+        ahead = _shift(own, -dr, -dc)
+        behind = _shift(own, dr, dc)
+        completes.append(ahead & _shift(ahead, -dr, -dc) | behind & _shift(behind, dr, dc) | ahead & behind)
+    landings = (completes[0] | completes[1] | completes[2] | completes[3]) & empty
+    candidates = empty & ~landings
+
+    free = empty | vacated
+    pushes = []     # pushes[d]: landings with an own piece next to them along DIRECTIONS[d] and room behind it
+    for d, (dr, dc) in enumerate(DIRECTIONS):
+        ahead = _shift(own, -dr, -dc)
+        pushing = candidates & ahead & _shift(free, -2 * dr, -2 * dc)
+        pushes.append(pushing)
+        if not pushing:
+            continue
+        # Where the pushed piece ends up; along the push's own line only the squares beyond it can help
+        axis = _AXIS[d]
+        lines = ahead & _shift(own, -2 * dr, -2 * dc)
+        for k in range(len(LINE_DIRECTIONS)):
+            if k != axis:
+                lines |= completes[k]
+        landings |= pushing & _shift(lines, -2 * dr, -2 * dc)
+
+    for d, e in _PUSH_PAIRS:
+        both = pushes[d] & pushes[e]
+        if both:
+            landings |= both & _shift(own, -DIRECTIONS[d][0] - DIRECTIONS[e][0], -DIRECTIONS[d][1] - DIRECTIONS[e][1])
+    return landings
+
+def _winning_codes(p1_bits, p2_bits, player, pieces, first=False):
+    bits = GEOMETRY.bits
+    own = p1_bits if player == PLAYER1 else p2_bits
+    empty = ~(p1_bits | p2_bits) & FULL_MASK
+    wins = array('H')
+    if pieces < NUM_PIECES:
+        for landing in iter_bits(_win_landings(own, empty, 0)):
+            if play_bits(p1_bits, p2_bits, player, None, landing)[2] == player:
+                wins.append(PLACEMENT + landing)
+                if first:
+                    break
+        return wins
+
+    # A source outside the landing's push area does not change the pushes, so one play-out of the
+    # landing with every piece left in place serves all those sources: the move wins if a completed
+    # line does not run through the source
+    sources = list(iter_bits(own))
+    for landing in iter_bits(_win_landings(own, empty, own)):
+        area = _PUSH_AREA[landing]
+        lines = None
+        for source in sources:
+            if area & bits[source]:
+                if play_bits(p1_bits, p2_bits, player, source, landing)[2] == player:
+                    wins.append(source * BOARD_CELLS + landing)
+            else:
+                if lines is None:
+                    child1, child2, _ = play_bits(p1_bits, p2_bits, player, None, landing)
+                    child = child1 if player == PLAYER1 else child2
+                    lines = [mask for sq in iter_bits(child & ~own | bits[landing]) for mask in GEOMETRY.line_masks_through[sq]
+                             if child & mask == mask]
+                if any(not mask & bits[source] for mask in lines):
+                    wins.append(source * BOARD_CELLS + landing)
+            if first and wins:
+                return wins
+    return wins
+
+def winning_moves(game, player=None, first=False):
+    """
+    Codes of every move that gives player (default: the side to move) 3 in a row at once, including
+    lines completed by pushed pieces. player may be the side not to move, to list the opponent's threats.
+    With first, stops at the first winning move found (enough to know whether there is one).
+    """
+    if player is None:
+        player = game.current_player
+    pieces = game.p1_pieces if player == PLAYER1 else game.p2_pieces
+    return _winning_codes(game.p1_bits, game.p2_bits, player, pieces, first)
+
+def threat_area(p1_bits, p2_bits, player, code):
+    """
+    Squares the outcome of player's winning move code depends on: its landing, its source, the squares
+    its pushes look at and the line it completes. A move that changes none of them leaves the win in place.
+    """
+    source = None if code >= PLACEMENT else code // BOARD_CELLS
+    landing = code % BOARD_CELLS
+    area = _PUSH_AREA[landing] if source is None else _PUSH_AREA[landing] | GEOMETRY.bits[source]
+    after1, after2, _ = play_bits(p1_bits, p2_bits, player, source, landing)
+    after = after1 if player == PLAYER1 else after2
+    for sq in iter_bits(area):
+        for mask in GEOMETRY.line_masks_through[sq]:
+            if after & mask == mask:
+                area |= mask
+    return area
+
+def threat_answers(game, threats):
+    """
+    Moves of the side to move that can change a square every one of the opponent's winning moves in threats
+    depends on: a superset of the moves that stop them, found without playing any move out, so each still
+    has to be checked for the opponent's wins. An empty array means the threats cannot all be stopped.
+    A move only changes its source and squares in its landing's push area.
+    """
+    player = game.current_player
+    opponent = PLAYER2 if player == PLAYER1 else PLAYER1
+    areas = [threat_area(game.p1_bits, game.p2_bits, opponent, code) for code in threats]
+    sources = _sources(game)
+    answers = array('H')
+    for landing in iter_bits(game.empty_bits()):
+        # A move from anywhere reaches the areas the landing touches; the others need the source in them
+        need = FULL_MASK
+        for area in areas:
+            if not _PUSH_AREA[landing] & area:
+                need &= area
+        if sources is None:
+            if need == FULL_MASK:
+                answers.append(PLACEMENT + landing)
+        else:
+            answers.extend(source * BOARD_CELLS + landing for source in sources if need & GEOMETRY.bits[source])
+    return answers
+
+def blocking_moves(game, threats=None):
+    """
+    Moves of the side to move after which the opponent has no immediate win, or None if the opponent
+    threatens none (threats can pass winning_moves(game, opponent)). An empty array means every move
+    loses, unless the side to move wins first; moves that win at once are not included.
+
+    The outcome of an opponent's winning move only depends on its landing, its source, the squares its
+    pushes look at and the line it completes, so only moves changing one of those squares for every
+    threat are checked for the opponent's wins.
+    """
+    player = game.current_player
+    opponent = PLAYER2 if player == PLAYER1 else PLAYER1
+    if threats is None:
+        threats = winning_moves(game, opponent)
+    if not threats:
+        return None
+    p1_bits, p2_bits = game.p1_bits, game.p2_bits
+    depends = [threat_area(p1_bits, p2_bits, opponent, code) for code in threats]
+
+    opponent_pieces = game.p1_pieces if opponent == PLAYER1 else game.p2_pieces
+    blocks = array('H')
+    for code in legal_moves(game):
+        source = None if code >= PLACEMENT else code // BOARD_CELLS
+        child1, child2, winner = play_bits(p1_bits, p2_bits, player, source, code % BOARD_CELLS)
+        if winner != EMPTY:
+            continue
+        changed = (child1 ^ p1_bits) | (child2 ^ p2_bits)
+        if all(changed & area for area in depends) and not _winning_codes(child1, child2, opponent, opponent_pieces, True):
+            blocks.append(code)
+    return blocks
+
+# _LINE_RESTS[sq] has, for every line through sq, the line's other two squares
+_LINE_RESTS = [[mask & ~GEOMETRY.bits[sq] for mask in GEOMETRY.line_masks_through[sq]] for sq in range(BOARD_CELLS)]
+
+def _open_two(own, blocked, sq):
+    """
+    True if sq and one more square of own are two squares of a line whose third square is not in blocked.
+    """
+    for rest in _LINE_RESTS[sq]:
+        mine = own & rest
+        if mine and mine != rest and not blocked & rest:
+            return True
+    return False
+
+def loose_pieces(bits):
+    """
+    The set bits that share no line with another set bit: pieces that can be moved without breaking a two.
+    """
+    loose = 0
+    for sq in iter_bits(bits):
+        if not any(bits & rest for rest in _LINE_RESTS[sq]):
+            loose |= GEOMETRY.bits[sq]
+    return loose
+
+def _tactical_source(own, loose, landing):
+    """
+    The piece a relocation onto landing is played from in the quiescence search: a loose piece (in no line
+    with another own piece) outside the landing's push area if there is one, else any piece outside it,
+    else any piece.
+    """
+    area = _PUSH_AREA[landing]
+    for pool in (loose & ~area, own & ~area, own):
+        if pool:
+            return (pool & -pool).bit_length() - 1
+
+def generate_tactical(game, threats=None):
+    """
+    Move codes for the quiescence search: moves landing where the opponent wins (threats is the
+    opponent's winning_moves, worked out if not given), then moves with a push that shifts one of the
+    mover's pieces onto the empty square of an open two (two pieces of a line whose third square is
+    empty) or an opponent's piece out of one of the opponent's open twos.
+
+    Where a move lands decides what it does to the lines, so once every piece is placed each landing is
+    tried from a single piece (_tactical_source) rather than from all of them.
+    """
+    player = game.current_player
+    opponent = PLAYER2 if player == PLAYER1 else PLAYER1
+    if threats is None:
+        threats = winning_moves(game, opponent)
+    bits = GEOMETRY.bits
+    own = game.own_bits()
+    opp = game.p2_bits if player == PLAYER1 else game.p1_bits
+    occupied = own | opp
+    empty = ~occupied & FULL_MASK
+    third_squares = threat_squares(own, empty) | threat_squares(opp, empty)
+    blocks = 0
+    for code in threats:
+        blocks |= bits[code % BOARD_CELLS]
+
+    pushes = 0
+    for landing in iter_bits(neighborhood(occupied) & empty & ~blocks):
+        for sq1, sq2 in zip(GEOMETRY.neighbors[landing], GEOMETRY.second_neighbors[landing]):
+            bit1, bit2 = bits[sq1], bits[sq2]
+            if occupied & bit1 and not occupied & bit2:
+                if own & bit1 and third_squares & bit2 or opp & bit1 and _open_two(opp, own, sq1):
+                    pushes |= bits[landing]
+                    break
+
+    if _sources(game) is None:
+        return _codes(None, blocks) + _codes(None, pushes)
+    loose = loose_pieces(own)
+    return array('H', [_tactical_source(own, loose, landing) * BOARD_CELLS + landing
+                       for landing in list(iter_bits(blocks)) + list(iter_bits(pushes))])
+
+# BATCHED CHILD EXPANSION
+# Every child of a position as one (N, BOARD_SIZE, BOARD_SIZE) int8 array, so the rules and the
+# evaluation run as a few numpy operations per position instead of Python loops per child.
+_NEIGHBOR_TABLE = np.array(GEOMETRY.neighbors, dtype=np.intp)                 # (BOARD_CELLS, 8)
+_SECOND_NEIGHBOR_TABLE = np.array(GEOMETRY.second_neighbors, dtype=np.intp)   # (BOARD_CELLS, 8)
+_PIECE_SCORE_TABLE = np.array(PIECE_SCORES, dtype=np.int64).reshape(BOARD_SIZE, BOARD_SIZE)
+_LINE_PATTERN_TABLE = np.array(LINE_PATTERN_SCORES, dtype=np.int64)
+
+def board_array(game):
+    """
+    Board of a Game or BitboardGame as a (BOARD_SIZE, BOARD_SIZE) int8 array.
+    """
+    if isinstance(game, BitboardGame):
+        flat = np.zeros(BOARD_CELLS, dtype=np.int8)
+        flat[list(iter_bits(game.p1_bits))] = PLAYER1
+        flat[list(iter_bits(game.p2_bits))] = PLAYER2
+        return flat.reshape(BOARD_SIZE, BOARD_SIZE)
+    return np.asarray(game.board, dtype=np.int8)
+
+def expand_children(board, player, moves):
+    """
+    Child boards after player plays each of moves on board, pushes applied.
+    moves is a sequence or (N, 2) / (N, 4) array of placements or movements, all of one kind and all legal.
+    Returns an (N, BOARD_SIZE, BOARD_SIZE) int8 array.
+    """
+    moves = np.asarray(moves, dtype=np.intp).reshape(len(moves), -1)
+    n = len(moves)
+    rows = np.arange(n)[:, None]
+    boards = np.repeat(np.asarray(board, dtype=np.int8).reshape(1, BOARD_CELLS), n, axis=0)
+    if moves.shape[1] == 4:
+        boards[rows[:, 0], moves[:, 0] * BOARD_SIZE + moves[:, 1]] = EMPTY
+    landings = moves[:, -2] * BOARD_SIZE + moves[:, -1]
+    boards[rows[:, 0], landings] = player
+
+    # The 8 immediate and 8 secondary neighbours are 16 different squares, so the pushes are independent
+    first = _NEIGHBOR_TABLE[landings]
+    second = _SECOND_NEIGHBOR_TABLE[landings]
+    first_values = boards[rows, first]
+    second_values = boards[rows, second]
+    pushed = (first_values != EMPTY) & (second_values == EMPTY)
+    boards[rows, second] = np.where(pushed, first_values, second_values)
+    boards[rows, first] = np.where(pushed, EMPTY, first_values)
+    return boards.reshape(n, BOARD_SIZE, BOARD_SIZE)
+
+def _ahead(boards, offset, dr, dc):
+    """
+    Value at each square of the square offset steps further along (dr, dc), for a batch of boards.
+    """
+    return np.roll(boards, (-offset * dr, -offset * dc), axis=(1, 2))
+
+def batch_check_winner(boards, mover):
+    """
+    Winner of each board in a batch (EMPTY if none), with the same simultaneous-win rule as
+    check_winner: if both players have 3 in a row, mover (the player who just moved) wins.
+    """
+    wins = {}
+    for player in (PLAYER1, PLAYER2):
+        mine = boards == player
+        found = np.zeros(len(boards), dtype=bool)
+        for dr, dc in LINE_DIRECTIONS:
+            line = mine & _ahead(mine, 1, dr, dc) & _ahead(mine, 2, dr, dc)
+            found |= line.any(axis=(1, 2))
+        wins[player] = found
+    winners = np.where(wins[PLAYER1], PLAYER1, np.where(wins[PLAYER2], PLAYER2, EMPTY))
+    return np.where(wins[PLAYER1] & wins[PLAYER2], mover, winners).astype(np.int8)
+
+def batch_evaluate(boards):
+    """
+    Pattern evaluation (see LINE_PATTERN_SCORES) of a batch of boards, from Player1's point of view.
+    Gives the same values as BitboardGame.eval_score.
+    """
+    digits = np.where(boards == PLAYER2, 2, boards).astype(np.intp)
+    scores = (boards * _PIECE_SCORE_TABLE).sum(axis=(1, 2), dtype=np.int64)
+    for dr, dc in LINE_DIRECTIONS:
+        codes = digits + 3 * _ahead(digits, 1, dr, dc) + 9 * _ahead(digits, 2, dr, dc)
+        scores += _LINE_PATTERN_TABLE[codes].sum(axis=(1, 2))
+    return scores
+
 def main():
     poptactoe = Game()
     poptactoe.play()
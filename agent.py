@@ -1,200 +1,427 @@
-from PushBattle import Game, PLAYER1, PLAYER2, EMPTY, BOARD_SIZE, NUM_PIECES, _torus
-import copy
+from PushBattle import BitboardGame, PLAYER1, EMPTY, NUM_PIECES
+from PushBattle import board_array, expand_children, batch_evaluate, legal_moves, decode_move, encode_move
+from PushBattle import winning_moves, blocking_moves, threat_answers, threat_area, threat_squares, generate_tactical, loose_pieces
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from move_ordering import MoveOrderer
+from symmetry import unique_moves
+from time_manager import TimeManager
 import time
 import random
 
+# Score of a won game; a win found ply plies from the root scores WIN_SCORE - ply, so faster wins and
+# slower losses are preferred, and every decided score is far outside the evaluation's range
+WIN_SCORE = 1000000
+WIN_BOUND = WIN_SCORE - 1000    # Scores at least this far from 0 are decided games
+
+def to_tt_score(score, ply):
+    """
+    Score as stored in the transposition table: a decided score counts plies from the node, not from the
+    root, so it stays right when the position is reached at another ply or in a later search.
+    """
+    if score >= WIN_BOUND:
+        return score + ply
+    if score <= -WIN_BOUND:
+        return score - ply
+    return score
+
+def from_tt_score(score, ply):
+    """
+    Inverse of to_tt_score for a node ply plies from the root.
+    """
+    if score >= WIN_BOUND:
+        return score - ply
+    if score <= -WIN_BOUND:
+        return score + ply
+    return score
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time limit is reached."""
+
 class Agent:
-    def __init__(self, player=PLAYER1, max_depth=10, time_limit=4.0):
+    def __init__(self, player=PLAYER1, max_depth=10, time_limit=4.0, tt_size_mb=32, aspiration_window=100, time_manager=None,
+                 batch_depth=None, block_depth=2, quiescence_nodes=0, null_move_reduction=2, lmr_depth=3, lmr_moves=4,
+                 lmr_reduction=1):
         self.player = player
-        self.first_move = True
         self.max_depth = max_depth
-        self.time_limit = time_limit
-        self.memo = {}
+        self.time_limit = time_limit                       # Hard limit of the current search, set from the time manager
+        self.time_manager = time_manager or TimeManager(max_latency=time_limit)
+        self.aspiration_window = aspiration_window         # Half-width of the root window around the last score
+        self.tt = TranspositionTable(size_mb=tt_size_mb)   # Scores are stored for the side to move, decided ones relative to the node
+        self.orderer = MoveOrderer()                       # Killer, history and counter-move tables for the whole game
+        self.nodes = 0
+        self.completed_depth = 0                           # Depth of the last fully searched iteration
+        self.pv = []                                       # Principal variation of the last completed iteration
+        self.iterations = []                               # (depth, score, best move) of every completed iteration
+        self.depth_nodes = []                              # (depth, nodes searched by that iteration) of every completed iteration
+        self.last_search = {}                              # Statistics of the last get_best_move call
+        self.stop_requested = False                        # Set from another thread to abort the search
+        self.batch_depth = batch_depth                     # Presort moves by batched 1-ply scores at this remaining depth or more (None: off)
+        self.block_depth = block_depth                     # Search only the blocking moves of a threat at this remaining depth or more (None: off)
+        self.quiescence_nodes = quiescence_nodes           # Nodes the quiescence search may visit below each leaf (0: leaves only check for a win-in-1)
+        self.quiescence_budget = 0                         # Nodes the current leaf's quiescence search may still visit
+        self.qnodes = 0                                    # Quiescence nodes of the current search, included in nodes
+        # Selective search, in the movement phase only
+        self.null_move_reduction = null_move_reduction     # Depth taken off a null-move search besides the passed ply (None: off)
+        self.lmr_depth = lmr_depth                         # Late moves are reduced at this remaining depth or more (None: off)
+        self.lmr_moves = lmr_moves                         # Moves of a node searched at full depth before reductions start
+        self.lmr_reduction = lmr_reduction                 # Plies a late move is reduced by
 
     def get_possible_moves(self, game):
-        moves = []
-        center_moves = []
-        current_pieces = game.p1_pieces if game.current_player == PLAYER1 else game.p2_pieces
-        center = BOARD_SIZE // 2
-
-        if current_pieces < NUM_PIECES:
-            for r in range(BOARD_SIZE):
-                for c in range(BOARD_SIZE):
-                    if game.board[r][c] == EMPTY:
-                        move = (r, c)
-                        if abs(r - center) <= 1 and abs(c - center) <= 1:
-                            center_moves.append(move)
-                        else:
-                            moves.append(move)
-            return center_moves + moves
-        else:
-            for r0 in range(BOARD_SIZE):
-                for c0 in range(BOARD_SIZE):
-                    if game.board[r0][c0] == game.current_player:
-                        for r1 in range(BOARD_SIZE):
-                            for c1 in range(BOARD_SIZE):
-                                if game.board[r1][c1] == EMPTY:
-                                    moves.append((r0, c0, r1, c1))
+        return [decode_move(code) for code in legal_moves(game)]
+
+    # Legal moves at the root; while pieces are being placed, moves a symmetry of the position maps
+    # onto another move lead to identical positions, so only one of each is kept
+    def root_moves(self, game):
+        moves = self.get_possible_moves(game)
+        pieces = game.p1_pieces if game.current_player == PLAYER1 else game.p2_pieces
+        if pieces < NUM_PIECES:
+            moves = unique_moves(game, moves)
         return moves
 
+    # The first placement is searched like any other move; on the empty board every square is
+    # equivalent, so the symmetry pruning leaves a single root move and the search is a token one
     def get_best_move(self, game):
-        if self.first_move:
-            self.first_move = False
-            return (4, 4)  # Safe central start
+        return self.search(game)
 
-        best_move = None
-        best_score = float('-inf')
+    # Iterative deepening search of the position; the limits come from the time manager unless given
+    # root_moves restricts the search to a subset of the legal moves (used by parallel root splitting);
+    # on_iteration, if given, is called with (depth, score, move) after every completed iteration
+    def search(self, game, soft_limit=None, hard_limit=None, root_moves=None, on_iteration=None):
+        # Scores are from the point of view of the player to move at the root
+        self.player = game.current_player
+        self.tt.new_search()
+        self.orderer.new_search()
+        self.nodes = 0
+        self.qnodes = 0
+        self.completed_depth = 0
+        self.pv = []
+        self.iterations = []
+        self.depth_nodes = []
         start_time = time.time()
-        depth = 3 if game.p1_pieces < NUM_PIECES else 5  # Adjust depth based on game state
+        root_ply = len(game.undo_stack)
 
-        while depth <= self.max_depth and (time.time() - start_time) < self.time_limit:
-            current_best_move = None
-            current_best_score = float('-inf')
+        # An immediate win, pushes included, is played at once without a search
+        wins = winning_moves(game, first=True)
+        if wins:
+            move = decode_move(wins[0])
+            self.last_search = {"depth": 0, "score": WIN_SCORE - 1, "nodes": 0, "qnodes": 0, "time": time.time() - start_time, "pv": [move], "iterations": [], "depth_nodes": [], "winning": True}
+            return move
 
-            for move in self.get_possible_moves(game):
-                if self.is_move_valid(game, move):
-                    new_game_state = self.create_game_copy(game)
-                    self.apply_move(new_game_state, move)
-                    score = self.minimax(new_game_state, depth - 1, False, float('-inf'), float('inf'), start_time)
+        if root_moves is None:
+            root_moves = self.root_moves(game)
+        # Against a threat only the moves that stop it are searched, unless none does
+        blocks = blocking_moves(game)
+        if blocks:
+            blocks = set(blocks)
+            root_moves = [move for move in root_moves if encode_move(move) in blocks] or root_moves
+        root_moves = self.orderer.order(game, list(root_moves), self.tt.best_move(game.key), 0)
+        best_move = root_moves[0] if root_moves else (4, 4)
+        best_score = None
+        depth = 1
 
-                    if score > current_best_score:
-                        current_best_score = score
-                        current_best_move = move
+        # A single legal move gets only a token search
+        if hard_limit is None:
+            soft_limit, hard_limit = self.time_manager.allocate(game, forced=len(root_moves) <= 1)
+        self.time_limit = hard_limit
 
-            if current_best_score > best_score:
-                best_score = current_best_score
-                best_move = current_best_move
+        while depth <= self.max_depth and (time.time() - start_time) < soft_limit:
+            iteration_nodes = self.nodes
+            try:
+                score, move, move_scores = self.aspiration_search(game, root_moves, depth, best_score, start_time)
+            except SearchTimeout:
+                # Throw the unfinished iteration away and take back the moves it left on the board
+                while len(game.undo_stack) > root_ply:
+                    game.unmake_move()
+                break
 
-            depth += 1
+            if best_score is not None:
+                soft_limit = self.time_manager.extend(soft_limit, self.time_limit, abs(score - best_score))
+            best_move, best_score = move, score
+            self.completed_depth = depth
+            self.iterations.append((depth, score, move))
+            self.depth_nodes.append((depth, self.nodes - iteration_nodes))
+            self.tt.store(game.key, depth, EXACT, score, move)
+            self.pv = self.principal_variation(game, depth)
+            if on_iteration is not None:
+                on_iteration(depth, score, move)
 
-        if best_move is None:
-            best_move = (4, 4)
+            # Next iteration starts with the best move, then the rest by this iteration's scores
+            root_moves.sort(key=lambda m: move_scores.get(m, float('-inf')), reverse=True)
+            root_moves.remove(best_move)
+            root_moves.insert(0, best_move)
+            depth += 1
 
+        self.last_search = {
+            "depth": self.completed_depth,
+            "score": best_score,
+            "nodes": self.nodes,
+            "qnodes": self.qnodes,
+            "time": time.time() - start_time,
+            "pv": self.pv,
+            "iterations": self.iterations,
+            "depth_nodes": self.depth_nodes,
+            "winning": False,
+        }
         return best_move
 
-    def minimax(self, game, depth, is_maximizing, alpha, beta, start_time):
-        if (time.time() - start_time) >= self.time_limit:
-            return 0
+    # Searches the root with a window around the previous iteration's score, widening it until the score falls inside
+    def aspiration_search(self, game, moves, depth, previous, start_time):
+        if previous is None:
+            return self.search_root(game, moves, depth, float('-inf'), float('inf'), start_time)
+
+        delta = self.aspiration_window
+        while delta <= 64 * self.aspiration_window:
+            alpha, beta = previous - delta, previous + delta
+            score, move, move_scores = self.search_root(game, moves, depth, alpha, beta, start_time)
+            if alpha < score < beta:
+                return score, move, move_scores
+            delta *= 4
+        return self.search_root(game, moves, depth, float('-inf'), float('inf'), start_time)
+
+    # Searches every root move at the given depth; returns the best score, best move and every move's score
+    # Moves after the first get a null-window probe, so their scores are only bounds unless they beat alpha
+    def search_root(self, game, moves, depth, alpha, beta, start_time):
+        best_score = float('-inf')
+        best_move = None
+        move_scores = {}
+        for move in moves:
+            changed = game.make_move(move)
+            if best_move is None:
+                score = -self.minimax(game, depth - 1, -beta, -alpha, start_time, changed, 1)
+            else:
+                score = -self.minimax(game, depth - 1, -alpha - 1, -alpha, start_time, changed, 1)
+                if alpha < score < beta:
+                    score = -self.minimax(game, depth - 1, -beta, -alpha, start_time, changed, 1)
+            game.unmake_move()
+            move_scores[move] = score
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        return best_score, best_move, move_scores
+
+    # Follows the transposition table's best moves from the current position
+    def principal_variation(self, game, depth):
+        pv = []
+        for _ in range(depth):
+            move = self.tt.best_move(game.key)
+            if move is None or not self.is_move_valid(game, move) or move not in self.get_possible_moves(game):
+                break
+            pv.append(move)
+            changed = game.make_move(move)
+            if game.check_winner_at(changed, -game.current_player) != EMPTY:
+                break
+        for _ in pv:
+            game.unmake_move()
+        return pv
+
+    # Principal variation search in negamax form: scores are from the point of view of the side to move.
+    # The first move is searched with the full window; the others get a null window around alpha, which only
+    # proves them no better, and are searched again with the full window when the probe fails high.
+    def minimax(self, game, depth, alpha, beta, start_time, changed=None, ply=0):
+        if self.stop_requested or (time.time() - start_time) >= self.time_limit:
+            raise SearchTimeout()
+        self.nodes += 1
+
+        # Only the lines through the squares the last move changed can hold a new winner;
+        # the turn has already passed, so the player who moved is -current_player
+        winner = game.check_winner() if changed is None else game.check_winner_at(changed, -game.current_player)
+        if winner != EMPTY:
+            return WIN_SCORE - ply if winner == game.current_player else ply - WIN_SCORE
+        if depth == 0:
+            self.quiescence_budget = self.quiescence_nodes
+            return self.quiescence(game, alpha, beta, start_time, ply)
 
         game_hash = self.hash_game_state(game)
-        if game_hash in self.memo:
-            return self.memo[game_hash]
-
-        winner = game.check_winner()
-        if depth == 0 or winner != EMPTY:
-            score = self.evaluate_move(game)
-            self.memo[game_hash] = score
-            return score
-
-        if is_maximizing:
-            max_eval = float('-inf')
-            for move in self.get_possible_moves(game):
-                if self.is_move_valid(game, move):
-                    new_game_state = self.create_game_copy(game)
-                    self.apply_move(new_game_state, move)
-                    eval = self.minimax(new_game_state, depth - 1, False, alpha, beta, start_time)
-                    max_eval = max(max_eval, eval)
-                    alpha = max(alpha, eval)
-                    if beta <= alpha:
-                        break
-            self.memo[game_hash] = max_eval
-            return max_eval
+        entry = self.tt.probe(game_hash)
+        tt_move = None
+        if entry is not None:
+            _, entry_depth, flag, score, tt_move, _ = entry
+            score = from_tt_score(score, ply)
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                elif flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        # The side to move wins with its next move; otherwise, with enough depth left, an opponent's
+        # threat leaves only the moves that can stop it, and no such move means the opponent wins next.
+        # PV nodes search the exact blocking moves; elsewhere the moves touching the threat are searched,
+        # each refuted by its child's win check
+        wins = winning_moves(game, first=True)
+        if wins:
+            return WIN_SCORE - ply - 1
+        movement = game.p1_pieces == NUM_PIECES and game.p2_pieces == NUM_PIECES
+        blocking = self.block_depth is not None and depth >= self.block_depth
+        threats = None
+        if blocking or (movement and depth >= 2):
+            threats = winning_moves(game, -game.current_player, first=True)
+        blocks = None
+        if blocking and threats:
+            blocks = blocking_moves(game, threats) if beta - alpha > 1 else threat_answers(game, threats)
+            if not blocks:
+                return ply + 2 - WIN_SCORE
+
+        # Selective search once every piece is on the board; not against a threat, where every move counts.
+        # Null move and late move reductions only apply from depth 2, so shallower nodes skip the threat test
+        selective = movement and not threats
+        if selective and self.null_move_allowed(game, depth, alpha, beta):
+            game.make_null_move()
+            eval = -self.minimax(game, max(0, depth - 1 - self.null_move_reduction), -beta, -beta + 1, start_time, [], ply + 1)
+            game.unmake_move()
+            if eval >= beta:
+                # A win or loss found after passing is not a real one, so only the bound is returned
+                return beta if abs(eval) >= WIN_BOUND else eval
+        reduce_late = selective and self.lmr_depth is not None and depth >= self.lmr_depth
+
+        alpha_orig = alpha
+        best_eval = float('-inf')
+        best_move = None
+        searched = 0
+        for move in self.node_moves(game, depth, tt_move, ply, wins, blocks):
+            if self.is_move_valid(game, move):
+                changed = game.make_move(move)
+                searched += 1
+                if best_move is None:
+                    eval = -self.minimax(game, depth - 1, -beta, -alpha, start_time, changed, ply + 1)
+                else:
+                    # Late moves are first probed at reduced depth and searched fully only if they beat alpha
+                    # never below depth 1, whatever lmr_reduction is set to
+                    reduction = max(0, min(self.lmr_reduction, depth - 2)) if reduce_late and searched > self.lmr_moves else 0
+                    eval = -self.minimax(game, depth - 1 - reduction, -alpha - 1, -alpha, start_time, changed, ply + 1)
+                    if reduction and eval > alpha:
+                        eval = -self.minimax(game, depth - 1, -alpha - 1, -alpha, start_time, changed, ply + 1)
+                    if alpha < eval < beta:
+                        eval = -self.minimax(game, depth - 1, -beta, -alpha, start_time, changed, ply + 1)
+                game.unmake_move()
+                if eval > best_eval:
+                    best_eval = eval
+                    best_move = move
+                alpha = max(alpha, eval)
+                if alpha >= beta:
+                    self.orderer.record_cutoff(game, move, depth, ply)
+                    break
+
+        if best_eval <= alpha_orig:
+            flag = UPPER
+        elif best_eval >= beta:
+            flag = LOWER
         else:
-            min_eval = float('inf')
-            for move in self.get_possible_moves(game):
-                if self.is_move_valid(game, move):
-                    new_game_state = self.create_game_copy(game)
-                    self.apply_move(new_game_state, move)
-                    eval = self.minimax(new_game_state, depth - 1, True, alpha, beta, start_time)
-                    min_eval = min(min_eval, eval)
-                    beta = min(beta, eval)
-                    if beta <= alpha:
-                        break
-            self.memo[game_hash] = min_eval
-            return min_eval
-
-    def create_game_copy(self, game):
-        new_game = Game()
-        new_game.board = copy.deepcopy(game.board)
-        new_game.current_player = game.current_player
-        new_game.p1_pieces = game.p1_pieces
-        new_game.p2_pieces = game.p2_pieces
-        return new_game
-
-    def apply_move(self, game, move):
-        if len(move) == 2:
-            r, c = move
-            game.board[r][c] = game.current_player
-            if game.current_player == PLAYER1:
-                game.p1_pieces += 1
+            flag = EXACT
+        self.tt.store(game_hash, depth, flag, to_tt_score(best_eval, ply), best_move)
+        return best_eval
+
+    # Null-move pruning is tried at null-window nodes whose static evaluation already reaches beta, not right
+    # after another null move, and only if the side to move has a loose piece: with every piece in a line,
+    # any relocation may break one, which is the zugzwang-like case where passing would be better than moving
+    def null_move_allowed(self, game, depth, alpha, beta):
+        if self.null_move_reduction is None or depth < 2 or beta - alpha > 1:
+            return False
+        if game.undo_stack and game.undo_stack[-1][0] is None:
+            return False
+        if self.evaluate_move(game) * game.current_player < beta:
+            return False
+        return loose_pieces(game.own_bits()) != 0
+
+    # Resolves the tactics below a leaf with the moves of generate_tactical: landings on the opponent's
+    # winning squares and pushes that change the open twos. Against a threat the side to move cannot stand
+    # pat, and if none of those moves holds the position scores as lost (the exact blocking_moves is left to
+    # the full-width search, as it costs as much as a ply here); otherwise it may stand pat on the static
+    # evaluation. Once quiescence_budget nodes have been visited the static evaluation is returned.
+    def quiescence(self, game, alpha, beta, start_time, ply):
+        if winning_moves(game, first=True):
+            return WIN_SCORE - ply - 1
+        stand_pat = self.evaluate_move(game) * game.current_player
+        if self.quiescence_budget <= 0:
+            return stand_pat
+
+        player = game.current_player
+        threats = winning_moves(game, -player)
+        if threats:
+            lost = best_eval = ply + 2 - WIN_SCORE
+            # A move that leaves the first threat's squares alone loses to it, without searching the reply
+            p1_bits, p2_bits = game.p1_bits, game.p2_bits
+            area = threat_area(p1_bits, p2_bits, -player, threats[0])
+        else:
+            best_eval = stand_pat
+            if best_eval >= beta:
+                return best_eval
+            # Without an open two of its own, the side to move has no tactical move worth searching
+            if not threat_squares(game.own_bits(), game.empty_bits()):
+                return best_eval
+            alpha = max(alpha, best_eval)
+
+        for code in generate_tactical(game, threats):
+            if self.quiescence_budget <= 0:
+                # Out of nodes before any answer to the threat was found: fall back on the static evaluation
+                if threats and best_eval == lost:
+                    best_eval = stand_pat
+                break
+            if self.stop_requested or (time.time() - start_time) >= self.time_limit:
+                raise SearchTimeout()
+            self.quiescence_budget -= 1
+            self.nodes += 1
+            self.qnodes += 1
+            changed = game.make_move(decode_move(code))
+            winner = game.check_winner_at(changed, player)
+            if winner != EMPTY:
+                eval = WIN_SCORE - ply - 1 if winner == player else ply + 1 - WIN_SCORE
+            elif threats and not (game.p1_bits ^ p1_bits | game.p2_bits ^ p2_bits) & area:
+                eval = lost
             else:
-                game.p2_pieces += 1
-            game.push_neighbors(r, c)
-        elif len(move) == 4:
-            r0, c0, r1, c1 = move
-            game.board[r0][c0] = EMPTY
-            game.board[r1][c1] = game.current_player
-            game.push_neighbors(r1, c1)
+                eval = -self.quiescence(game, -beta, -alpha, start_time, ply + 1)
+            game.unmake_move()
+            best_eval = max(best_eval, eval)
+            alpha = max(alpha, eval)
+            if alpha >= beta:
+                break
+        return best_eval
+
+    # Moves of an interior node, best first: the blocking moves if the opponent threatens to win, else
+    # lazily from the staged generator, or, at nodes at least batch_depth from the leaves, all of them
+    # presorted by their batched 1-ply scores and then ordered; wins is the node's winning_moves
+    def node_moves(self, game, depth, tt_move, ply, wins=None, blocks=None):
+        if blocks is not None:
+            return self.orderer.order(game, [decode_move(code) for code in blocks], tt_move, ply)
+        if self.batch_depth is None or depth < self.batch_depth:
+            return self.orderer.staged(game, tt_move, ply, wins)
+        moves = self.get_possible_moves(game)
+        scores = self.frontier_scores(game, moves)
+        moves.sort(key=scores.get, reverse=True)
+        return self.orderer.order(game, moves, tt_move, ply)
 
+    # Static leaf scores of every child for the side to move, evaluated as one numpy batch
+    def frontier_scores(self, game, moves):
+        scores = {}
+        # A batch holds moves of one kind, so placements and movements are expanded separately
+        for kind in (2, 4):
+            batch = [move for move in moves if len(move) == kind]
+            if batch:
+                children = expand_children(board_array(game), game.current_player, batch)
+                for move, score in zip(batch, batch_evaluate(children).tolist()):
+                    scores[move] = score * game.current_player
+        return scores
+
+    # Pattern evaluation from Player1's point of view; BitboardGame keeps it up to date move by move
     def evaluate_move(self, game):
-        score = 0
-        center = BOARD_SIZE // 2
-        weights = [[center - max(abs(r - center), abs(c - center)) for c in range(BOARD_SIZE)] for r in range(BOARD_SIZE)]
-
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if game.board[r][c] == PLAYER1:
-                    score += weights[r][c] * 3
-                    if self.is_multiple_winning_lines(game, PLAYER1, r, c):
-                        score += 2000
-                    if self.would_win(game, PLAYER1, r, c):
-                        score += 1500
-                elif game.board[r][c] == PLAYER2:
-                    score -= weights[r][c] * 3
-                    if self.is_multiple_winning_lines(game, PLAYER2, r, c):
-                        score -= 2000
-                    if self.would_win(game, PLAYER2, r, c):
-                        score -= 1500
-        return score
-
-    def is_multiple_winning_lines(self, game, player, row, col):
-        winning_lines = 0
-        directions = [(-1, 0), (0, -1), (-1, -1), (-1, 1)]
-        for dr, dc in directions:
-            count = 0
-            for i in range(-2, 3):
-                r, c = _torus(row + i * dr, col + i * dc)
-                if game.board[r][c] == player:
-                    count += 1
-                    if count == 3:
-                        winning_lines += 1
-                        break
-                else:
-                    count = 0
-        return winning_lines >= 2
-
-    def would_win(self, game, player, row, col):
-        directions = [(-1, 0), (0, -1), (-1, -1), (-1, 1)]
-        for dr, dc in directions:
-            count = 0
-            for i in range(-2, 3):
-                r, c = _torus(row + i * dr, col + i * dc)
-                if game.board[r][c] == player:
-                    count += 1
-                    if count == 2:  # Detects a two-in-a-row that can turn into three-in-a-row
-                        return True
-                else:
-                    count = 0
-        return False
+        if isinstance(game, BitboardGame):
+            return game.eval_score
+        return int(batch_evaluate(board_array(game)[None])[0])
 
     def is_move_valid(self, game, move):
         if len(move) == 2:
             r, c = move
-            return game.board[r][c] == EMPTY
+            return game.get(r, c) == EMPTY
         elif len(move) == 4:
             r0, c0, r1, c1 = move
-            return game.board[r0][c0] == game.current_player and game.board[r1][c1] == EMPTY
+            return game.get(r0, c0) == game.current_player and game.get(r1, c1) == EMPTY
         return False
 
     def hash_game_state(self, game):
-        return tuple(map(tuple, game.board)), game.current_player
+        return game.key
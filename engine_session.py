@@ -0,0 +1,63 @@
+from PushBattle import PLAYER1, GEOMETRY, iter_bits
+
+class EngineSession:
+    """
+    Keeps the engine's own copy of the game between requests.
+
+    The judge sends the whole position with every /move. Instead of starting over from it, the
+    session works out which opponent move leads from the position after our last move to the
+    incoming one, plays it on the persistent game and checks the Zobrist keys match. The game's
+    undo stack then holds the real move history (so counter-moves apply at the root), and the
+    agent's transposition table and history tables continue from the previous turn.
+    """
+    def __init__(self):
+        self.position = None    # Persistent BitboardGame, or None before the first move
+        self.synced = 0         # Requests continued from the persistent position
+        self.resyncs = 0        # Requests that had to start from the judge's position
+
+    # Returns the persistent position, brought up to date with the judge's game
+    def sync(self, game):
+        if self.position is not None:
+            if self.position.key == game.key:
+                self.synced += 1
+                return self.position
+            reply = self.find_reply(game)
+            if reply is not None:
+                self.position.make_move(reply)
+                self.synced += 1
+                self.position.turn_count = game.turn_count
+                return self.position
+        self.resyncs += 1
+        self.position = game.copy()
+        return self.position
+
+    # Plays our chosen move on the persistent position
+    def record_own_move(self, move):
+        self.position.make_move(move)
+
+    # Finds the move of the side to move in self.position that produces game, or None
+    def find_reply(self, game):
+        position = self.position
+        # After our move the opponent is to move, and in the judge's game it is our turn again
+        if position.current_player != -game.current_player:
+            return None
+        if position.current_player == PLAYER1:
+            before, after = position.p1_bits, game.p1_bits
+            placed = game.p1_pieces > position.p1_pieces
+        else:
+            before, after = position.p2_bits, game.p2_bits
+            placed = game.p2_pieces > position.p2_pieces
+        # The moved or placed piece is never pushed, so it sits on a square that was empty before
+        for landing in iter_bits(after & position.empty_bits()):
+            r1, c1 = GEOMETRY.coords[landing]
+            if placed:
+                candidates = [(r1, c1)]
+            else:
+                candidates = [GEOMETRY.coords[source] + (r1, c1) for source in iter_bits(before)]
+            for move in candidates:
+                position.make_move(move)
+                matched = position.key == game.key
+                position.unmake_move()
+                if matched:
+                    return move
+        return None
@@ -0,0 +1,238 @@
+from PushBattle import PLAYER1, EMPTY, NUM_PIECES, GEOMETRY, iter_bits, threat_squares
+from PushBattle import board_array, expand_children, batch_evaluate, legal_moves, decode_move
+from time_manager import TimeManager
+from move_ordering import landing_square
+import math
+import random
+import time
+
+# Candidate move classes used for progressive widening, best first
+WIN = 0
+BLOCK = 1
+QUIET = 2
+
+class MCTSAgent:
+    """
+    Monte Carlo Tree Search (UCT) player with the same get_best_move(game) interface as agent.Agent.
+
+    Nodes live in a preallocated pool of parallel lists indexed by node number, children are linked
+    through first_child / next_sibling. A node only gets another child once
+    widening_c * visits ** widening_alpha exceeds its child count, taking candidates in heuristic order
+    (wins, blocks, then the rest by the batched static evaluation of the child). Playouts take immediate wins, usually block the
+    opponent's 3-in-a-row squares and are otherwise random. best_move() can be called at any moment.
+    """
+    def __init__(self, player=PLAYER1, time_limit=4.0, exploration=1.4, widening_c=2.0, widening_alpha=0.5,
+                 playout_depth=40, block_probability=0.9, capacity=200000, seed=None, time_manager=None):
+        self.player = player
+        self.time_limit = time_limit
+        self.exploration = exploration              # UCT exploration constant
+        self.widening_c = widening_c                # Progressive widening: children allowed = c * visits ** alpha
+        self.widening_alpha = widening_alpha
+        self.playout_depth = playout_depth          # Playouts longer than this count as a draw
+        self.block_probability = block_probability  # Chance a playout move blocks an opponent 3-in-a-row square
+        self.capacity = capacity                    # Size of the node pool
+        self.time_manager = time_manager or TimeManager(max_latency=time_limit)
+        self.rng = random.Random(seed)
+        self.iterations = 0
+        self.last_search = {}
+        self._allocate()
+
+    def _allocate(self):
+        capacity = self.capacity
+        self.parent = [-1] * capacity
+        self.first_child = [-1] * capacity
+        self.next_sibling = [-1] * capacity
+        self.child_count = [0] * capacity
+        self.visits = [0] * capacity
+        self.value = [0.0] * capacity           # Sum of rewards for the player who moved into the node
+        self.mover = [EMPTY] * capacity         # Player who made the move leading to the node
+        self.terminal = [EMPTY] * capacity      # Winner if the move into the node ended the game
+        self.move = [None] * capacity
+        self.candidates = [None] * capacity     # Moves not yet expanded, best first
+        self.size = 0
+
+    def get_best_move(self, game):
+        soft_limit, hard_limit = self.time_manager.allocate(game)
+        return self.run(game, hard_limit)
+
+    # Runs MCTS iterations on the position until the time limit and returns the best move
+    def run(self, game, time_limit):
+        start_time = time.time()
+        self.size = 0
+        self.iterations = 0
+        root = self._new_node(-1, None, -game.current_player)
+        self.candidates[root] = self._candidates(game)
+        if len(self.candidates[root]) == 1 or self.candidates[root][0][0] == WIN:
+            self.last_search = {"iterations": 0, "nodes": 1, "time": time.time() - start_time}
+            return self.candidates[root][0][1]
+        self.candidates[root] = [move for _, move in self.candidates[root]]
+
+        while time.time() - start_time < time_limit:
+            self._iterate(game)
+            self.iterations += 1
+
+        self.last_search = {
+            "iterations": self.iterations,
+            "nodes": self.size,
+            "time": time.time() - start_time,
+        }
+        return self.best_move()
+
+    # Most visited child of the root so far
+    def best_move(self):
+        best, best_visits = None, -1
+        child = self.first_child[0] if self.size else -1
+        while child != -1:
+            if self.visits[child] > best_visits:
+                best, best_visits = self.move[child], self.visits[child]
+            child = self.next_sibling[child]
+        if best is None and self.size and self.candidates[0]:
+            best = self.candidates[0][0]
+        return best
+
+    # Selection, expansion, playout and backpropagation from the root
+    def _iterate(self, game):
+        node = 0
+        made = 0
+        while self.terminal[node] == EMPTY:
+            if self.candidates[node] is None:
+                self.candidates[node] = [move for _, move in self._candidates(game)]
+            allowed = self.widening_c * (self.visits[node] + 1) ** self.widening_alpha
+            if self.candidates[node] and self.child_count[node] < allowed and self.size < self.capacity:
+                move = self.candidates[node].pop(0)
+                changed = game.make_move(move)
+                made += 1
+                node = self._new_node(node, move, -game.current_player)
+                self.terminal[node] = game.check_winner_at(changed, -game.current_player)
+                break
+            child = self._select_child(node)
+            if child == -1:
+                break
+            game.make_move(self.move[child])
+            made += 1
+            node = child
+
+        winner = self.terminal[node] if self.terminal[node] != EMPTY else self._playout(game)
+
+        while node != -1:
+            self.visits[node] += 1
+            if winner == EMPTY:
+                self.value[node] += 0.5
+            elif winner == self.mover[node]:
+                self.value[node] += 1.0
+            node = self.parent[node]
+        for _ in range(made):
+            game.unmake_move()
+
+    def _new_node(self, parent, move, mover):
+        node = self.size
+        self.size += 1
+        self.parent[node] = parent
+        self.first_child[node] = -1
+        self.child_count[node] = 0
+        self.visits[node] = 0
+        self.value[node] = 0.0
+        self.mover[node] = mover
+        self.terminal[node] = EMPTY
+        self.move[node] = move
+        self.candidates[node] = None
+        if parent != -1:
+            self.next_sibling[node] = self.first_child[parent]
+            self.first_child[parent] = node
+            self.child_count[parent] += 1
+        else:
+            self.next_sibling[node] = -1
+        return node
+
+    # UCT child selection
+    def _select_child(self, node):
+        log_visits = math.log(self.visits[node] + 1)
+        best, best_score = -1, float('-inf')
+        child = self.first_child[node]
+        while child != -1:
+            visits = self.visits[child]
+            if visits == 0:
+                return child
+            score = self.value[child] / visits + self.exploration * math.sqrt(log_visits / visits)
+            if score > best_score:
+                best, best_score = child, score
+            child = self.next_sibling[child]
+        return best
+
+    # Legal moves as (class, move), sorted for progressive widening
+    def _candidates(self, game):
+        player = game.current_player
+        own = game.own_bits()
+        opp = game.p2_bits if player == PLAYER1 else game.p1_bits
+        empty = game.empty_bits()
+        win_squares = threat_squares(own, empty)
+        block_squares = threat_squares(opp, empty)
+        ranked = []
+        for move in map(decode_move, legal_moves(game)):
+            landing = landing_square(move)
+            bit = GEOMETRY.bits[landing]
+            if bit & win_squares:
+                changed = game.make_move(move)
+                won = game.check_winner_at(changed, player) == player
+                game.unmake_move()
+                if won:
+                    ranked.append((WIN, 0, move))
+                    continue
+            if bit & block_squares:
+                ranked.append((BLOCK, self.rng.random(), move))
+                continue
+            ranked.append((QUIET, self.rng.random(), move))
+        # Quiet moves are ranked by the static evaluation of the child, scored for all of them in one batch
+        quiet = [move for kind, _, move in ranked if kind == QUIET]
+        if quiet:
+            scores = batch_evaluate(expand_children(board_array(game), player, quiet)).tolist()
+            value = {move: score * player for move, score in zip(quiet, scores)}
+            ranked = [(kind, -value[move] - tiebreak if kind == QUIET else tiebreak, move) for kind, tiebreak, move in ranked]
+        ranked.sort(key=lambda item: (item[0], item[1]))
+        return [(kind, move) for kind, _, move in ranked]
+
+    # Plays the position out and returns the winner, or EMPTY if the playout hits its length limit
+    def _playout(self, game):
+        rng = self.rng
+        made = 0
+        winner = EMPTY
+        while made < self.playout_depth:
+            player = game.current_player
+            own = game.own_bits()
+            opp = game.p2_bits if player == PLAYER1 else game.p1_bits
+            empty = game.empty_bits()
+            pieces = game.p1_pieces if player == PLAYER1 else game.p2_pieces
+            sources = [None] if pieces < NUM_PIECES else list(iter_bits(own))
+
+            # Take a win if a 3-in-a-row square can be filled without breaking the line
+            move = None
+            for landing in iter_bits(threat_squares(own, empty)):
+                for source in sources:
+                    candidate = GEOMETRY.coords[landing] if source is None else GEOMETRY.coords[source] + GEOMETRY.coords[landing]
+                    changed = game.make_move(candidate)
+                    won = game.check_winner_at(changed, player) == player
+                    game.unmake_move()
+                    if won:
+                        move = candidate
+                        break
+                if move is not None:
+                    break
+
+            if move is None:
+                blocks = list(iter_bits(threat_squares(opp, empty)))
+                if blocks and rng.random() < self.block_probability:
+                    landing = rng.choice(blocks)
+                else:
+                    landing = rng.choice(list(iter_bits(empty)))
+                source = rng.choice(sources)
+                move = GEOMETRY.coords[landing] if source is None else GEOMETRY.coords[source] + GEOMETRY.coords[landing]
+
+            changed = game.make_move(move)
+            made += 1
+            winner = game.check_winner_at(changed, player)
+            if winner != EMPTY:
+                break
+
+        for _ in range(made):
+            game.unmake_move()
+        return winner
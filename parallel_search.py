@@ -0,0 +1,199 @@
+from PushBattle import PLAYER1, winning_moves, blocking_moves, encode_move, decode_move
+from agent import Agent
+from time_manager import TimeManager
+import multiprocessing
+import os
+import queue
+import time
+
+def _worker_main(worker_id, agent_kwargs, tasks, results):
+    """
+    Body of a helper process: keeps one Agent for the whole game and searches the root moves it is sent.
+    The limits arrive as absolute times, so time the task spent being built and queued counts against them.
+    Every completed depth is reported at once, and the final result is reported with done set.
+    """
+    agent = Agent(**agent_kwargs)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        search_id, game, moves, soft_deadline, hard_deadline = task
+
+        def report(depth, score, move):
+            info = {"depth": depth, "score": score, "nodes": agent.nodes, "iterations": list(agent.iterations), "winning": False}
+            results.put((search_id, worker_id, move, info, False))
+
+        now = time.time()
+        hard_limit = max(0.01, hard_deadline - now)
+        soft_limit = max(0.01, min(soft_deadline, hard_deadline) - now)
+        move = agent.search(game, soft_limit, hard_limit, root_moves=moves, on_iteration=report)
+        results.put((search_id, worker_id, move, agent.last_search, True))
+
+class ParallelAgent:
+    """
+    Spreads Agent's iterative deepening over a pool of helper processes by splitting the root.
+
+    The root moves are ordered once and dealt round-robin to the workers, so each worker gets a share of
+    the promising moves. Every worker runs its own iterative deepening (with its own transposition and
+    history tables, kept for the whole game) on its share and reports the best move of every completed
+    depth on a shared result queue as soon as it has it. Workers are sent an absolute deadline ipc_margin
+    before the hard limit. If a share has no completed depth once all but fallback_share of the time is
+    gone, the local agent searches the missing shares itself in the rest, so no share drops out of the
+    comparison unseen. The answer is the best score at the deepest depth every share completed, and the
+    move is always returned within the hard limit.
+
+    Daemonic processes cannot start children, so inside one (such as a worker of Tournament.run's Pool)
+    the local agent searches alone, as with a single worker.
+    """
+    def __init__(self, player=PLAYER1, workers=None, time_limit=4.0, max_depth=10, tt_size_mb=32,
+                 ipc_margin=0.1, fallback_share=0.25, time_manager=None):
+        self.player = player
+        self.workers = workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.ipc_margin = ipc_margin        # Seconds kept back for sending the game and collecting results
+        self.fallback_share = fallback_share    # Part of the time left for searching shares no worker completed a depth of
+        self.time_manager = time_manager or TimeManager(max_latency=time_limit)
+        # The local agent orders the root and searches alone when there is a single worker
+        self.agent = Agent(player=player, max_depth=max_depth, time_limit=time_limit, tt_size_mb=tt_size_mb,
+                           time_manager=self.time_manager)
+        self.agent_kwargs = {"player": player, "max_depth": max_depth, "time_limit": time_limit, "tt_size_mb": tt_size_mb}
+        self.processes = []
+        self.task_queues = []
+        self.results = None
+        self.search_id = 0
+        self.last_search = {}
+
+    # Starts the helper processes; called on the first parallel search
+    def start(self):
+        if self.processes:
+            return
+        context = multiprocessing.get_context()
+        self.results = context.Queue()
+        for worker_id in range(self.workers):
+            tasks = context.Queue()
+            process = context.Process(target=_worker_main, args=(worker_id, self.agent_kwargs, tasks, self.results), daemon=True)
+            process.start()
+            self.processes.append(process)
+            self.task_queues.append(tasks)
+
+    # Stops the helper processes
+    def close(self):
+        for tasks in self.task_queues:
+            tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.task_queues = []
+        self.results = None
+
+    def get_best_move(self, game):
+        return self.parallel_search(game)
+
+    # Root-splitting search of the position within the time manager's limits
+    def parallel_search(self, game):
+        start_time = time.time()
+        self.player = game.current_player
+        agent = self.agent
+        wins = winning_moves(game, first=True)
+        if wins:
+            self.last_search = {"depth": 0, "score": None, "nodes": 0, "time": time.time() - start_time, "workers": 0, "winning": True}
+            return decode_move(wins[0])
+
+        # Against a threat only the blocking moves are dealt out
+        moves = agent.root_moves(game)
+        blocks = blocking_moves(game)
+        if blocks:
+            blocks = set(blocks)
+            moves = [move for move in moves if encode_move(move) in blocks] or moves
+        moves = agent.orderer.order(game, moves, agent.tt.best_move(game.key), 0)
+        soft_limit, hard_limit = self.time_manager.allocate(game, forced=len(moves) <= 1)
+        if self.workers <= 1 or len(moves) <= 1 or multiprocessing.current_process().daemon:
+            move = agent.search(game, soft_limit, hard_limit)
+            self.last_search = dict(agent.last_search, workers=1)
+            return move
+
+        self.start()
+        self.search_id += 1
+        shares = [moves[i::self.workers] for i in range(self.workers)]
+        # Deadlines count from the start of this call, not from when a worker picks its task up
+        worker_deadline = start_time + max(0.05, hard_limit - self.ipc_margin)
+        sent = game.copy()
+        pending = {}
+        for worker_id, (tasks, share) in enumerate(zip(self.task_queues, shares)):
+            if share:
+                tasks.put((self.search_id, sent, share, start_time + soft_limit, worker_deadline))
+                pending[worker_id] = share
+
+        # Latest report of every worker; a worker is pending until its final result arrives
+        latest = {}
+        self.collect(latest, pending, start_time + max(0.05, (hard_limit - self.ipc_margin) * (1 - self.fallback_share)))
+        missing = [move for worker_id, share in enumerate(shares) if share and not self.completed(latest.get(worker_id))
+                   for move in share]
+        local = None
+        if missing:
+            # Searched here in the time kept for it rather than left out of the comparison
+            remaining = max(0.01, worker_deadline - time.time())
+            move = agent.search(game, remaining, remaining, root_moves=missing)
+            local = (move, agent.last_search)
+        self.collect(latest, pending, worker_deadline)
+
+        reports = [report for report in latest.values() if self.completed(report)]
+        searched = {worker_id for worker_id, report in latest.items() if self.completed(report)}
+        unsearched = [move for worker_id, share in enumerate(shares) if share and worker_id not in searched for move in share]
+        # The local search stands in for the shares whose workers still have no completed depth
+        if unsearched and self.completed(local):
+            reports.append(local)
+            unsearched = [move for move in unsearched if move not in missing]
+
+        move, score, depth = self.combine(reports, moves[0])
+        self.last_search = {
+            "depth": depth,
+            "score": score,
+            "nodes": sum(info.get("nodes", 0) for _, info in reports),
+            "time": time.time() - start_time,
+            "workers": len(searched),
+            "local_moves": len(missing),
+            "unsearched_moves": len(unsearched),
+            "winning": False,
+        }
+        return move
+
+    # Collects worker reports into latest until every pending worker is done or the deadline passes
+    def collect(self, latest, pending, deadline):
+        while pending:
+            remaining = deadline - time.time()
+            try:
+                if remaining > 0:
+                    search_id, worker_id, move, info, done = self.results.get(timeout=remaining)
+                else:
+                    search_id, worker_id, move, info, done = self.results.get_nowait()
+            except queue.Empty:
+                return
+            if search_id != self.search_id:
+                continue
+            latest[worker_id] = (move, info)
+            if done:
+                del pending[worker_id]
+
+    # True if the (move, info) report has a completed depth or a winning move
+    @staticmethod
+    def completed(report):
+        return report is not None and bool(report[1].get("winning") or report[1].get("iterations"))
+
+    # Best move at the deepest depth completed by every report; fallback if nothing came back
+    def combine(self, reports, fallback):
+        winning = [move for move, info in reports if info.get("winning")]
+        if winning:
+            return winning[0], None, 0
+        completed = [info["iterations"] for _, info in reports if info.get("iterations")]
+        if not completed:
+            return fallback, None, 0
+        depth = min(iterations[-1][0] for iterations in completed)
+        best_move, best_score = fallback, float('-inf')
+        for iterations in completed:
+            for iteration_depth, score, move in iterations:
+                if iteration_depth == depth and score > best_score:
+                    best_move, best_score = move, score
+        return best_move, best_score, depth
@@ -1,5 +1,5 @@
 from flask import Flask, request, jsonify
-from PushBattle import Game, PLAYER1, PLAYER2, EMPTY, BOARD_SIZE, NUM_PIECES, _torus
+from PushBattle import BitboardGame
 
 # This simulates player 2 always playing random moves - you may modify to test locally
 
@@ -27,7 +27,7 @@ def start_game():
     global agent
     data = request.get_json()
     game_data = data.get('game')
-    game = Game.from_dict(game_data)
+    game = BitboardGame.from_dict(game_data)
     board = data.get('board')
     first_turn = data.get('first_turn')
     max_latency = data.get('max_latency')
@@ -68,7 +68,7 @@ def make_move():
     """
     data = request.get_json()
     game_data = data.get('game')
-    game = Game.from_dict(game_data)
+    game = BitboardGame.from_dict(game_data)
     board = data.get('board')
     turn_count = data.get('turn_count')
     attempt_number = data.get('attempt_number')
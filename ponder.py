@@ -0,0 +1,96 @@
+from PushBattle import EMPTY
+import threading
+import time
+
+class Ponderer:
+    """
+    Keeps an Agent searching on the opponent's clock.
+
+    After the player server answers a move, start() predicts the opponent's replies (the reply from
+    the principal variation first, then the agent's move ordering) and searches the position after
+    each one in a background thread. When the next request arrives, stop() halts the search and
+    take() returns the pondered move if the real position is one that was searched at least as deep
+    as the agent's last search on its own clock. Even on a miss the agent's transposition and
+    history tables are warm.
+    """
+    def __init__(self, agent, max_replies=3, slice_time=None, min_depth=3, start_delay=0.05):
+        self.agent = agent
+        self.max_replies = max_replies      # How many predicted replies to search
+        self.slice_time = slice_time        # Seconds per predicted reply; defaults to the agent's hard limit
+        self.min_depth = min_depth          # Depth a pondered result needs before any normal search was seen
+        self.normal_depth = None            # Completed depth of the agent's last search on its own clock
+        self.searched = False               # take() missed, so the agent searched the current move itself
+        self.start_delay = start_delay      # Lets the server finish sending its reply before searching
+        self.results = {}                   # position key -> (move, completed depth, winning)
+        self.thread = None
+        self.hits = 0
+        self.misses = 0
+
+    # Starts pondering the position after our move (the opponent is to move in game)
+    def start(self, game):
+        self.stop()
+        if self.searched:
+            info = self.agent.last_search
+            if not info.get("winning") and info.get("depth", 0) > 0:
+                self.normal_depth = info["depth"]
+            self.searched = False
+        self.results = {}
+        replies = self.predict_replies(game)
+        if not replies:
+            return
+        self.agent.stop_requested = False
+        self.thread = threading.Thread(target=self._run, args=(game.copy(), replies), daemon=True)
+        self.thread.start()
+
+    # Stops the background search and waits for it to unwind
+    def stop(self):
+        if self.thread is not None:
+            self.agent.stop_requested = True
+            self.thread.join()
+            self.thread = None
+            self.agent.stop_requested = False
+
+    # Returns the pondered move for the position, or None on a miss
+    def take(self, game):
+        result = self.results.get(game.key)
+        if result is not None:
+            move, depth, winning = result
+            required = self.min_depth if self.normal_depth is None else self.normal_depth
+            if winning or depth >= required:
+                self.hits += 1
+                return move
+        self.misses += 1
+        self.searched = True
+        return None
+
+    # Most likely opponent replies, best guess first
+    def predict_replies(self, game):
+        agent = self.agent
+        replies = []
+        pv = agent.pv
+        if len(pv) >= 2 and pv[1] in agent.get_possible_moves(game):
+            replies.append(pv[1])
+        tt_move = agent.tt.best_move(game.key)
+        for move in agent.orderer.order(game, agent.get_possible_moves(game), tt_move, 1):
+            if len(replies) >= self.max_replies:
+                break
+            if move not in replies:
+                replies.append(move)
+        return replies
+
+    def _run(self, game, replies):
+        time.sleep(self.start_delay)
+        slice_time = self.slice_time or self.agent.time_manager.hard_limit()
+        for reply in replies:
+            if self.agent.stop_requested:
+                return
+            changed = game.make_move(reply)
+            if game.check_winner_at(changed, -game.current_player) != EMPTY:
+                game.unmake_move()
+                continue
+            move = self.agent.search(game, slice_time, slice_time)
+            info = self.agent.last_search
+            # A search stopped before finishing depth 1 has nothing worth keeping
+            if info.get("winning") or info.get("depth", 0) > 0:
+                self.results[game.key] = (move, info.get("depth", 0), info.get("winning", False))
+            game.unmake_move()
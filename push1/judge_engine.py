@@ -1,7 +1,8 @@
 import numpy as np
 import requests
 import time
-from PushBattle import Game, PLAYER1, PLAYER2, EMPTY, BOARD_SIZE, NUM_PIECES, _torus, chess_notation_to_array, array_to_chess_notation
+from PushBattle import BitboardGame, PLAYER1, PLAYER2, EMPTY, chess_notation_to_array, array_to_chess_notation
+from PushBattle import legal_moves, decode_move
 
 import random
 class RandomAgent:
@@ -10,25 +11,7 @@ class RandomAgent:
     
     def get_possible_moves(self, game):
         """Returns list of all possible moves in current state."""
-        moves = []
-        current_pieces = game.p1_pieces if game.current_player == PLAYER1 else game.p2_pieces
-        
-        if current_pieces < NUM_PIECES:
-            # placement moves
-            for r in range(BOARD_SIZE):
-                for c in range(BOARD_SIZE):
-                    if game.board[r][c] == EMPTY:
-                        moves.append((r, c))
-        else:
-            # movement moves
-            for r0 in range(BOARD_SIZE):
-                for c0 in range(BOARD_SIZE):
-                    if game.board[r0][c0] == game.current_player:
-                        for r1 in range(BOARD_SIZE):
-                            for c1 in range(BOARD_SIZE):
-                                if game.board[r1][c1] == EMPTY:
-                                    moves.append((r0, c0, r1, c1))
-        return moves
+        return [decode_move(code) for code in legal_moves(game)]
         
     def get_best_move(self, game):
         """Returns a random valid move."""
@@ -43,172 +26,316 @@ class Agent:
         self.agent_name = agent_name
         self.latency = None
 
-class Judge:
-    def __init__(self, p1_url, p2_url):
-        self.p1_url = p1_url
-        self.p2_url = p2_url
-        self.game = Game()
-        self.p1_agent = None
-        self.p2_agent = None
-        self.game_str = ""
+class TransportError(Exception):
+    """Raised by a transport when a move request fails; the judge counts it as a failed attempt."""
 
-    def check_latency(self):
-        """Check latency for both players and create their agents"""
-        # Check P1
-        try:
-            start_time = time.time()
-            response = requests.get(self.p1_url, timeout=TIMEOUT)
-            end_time = time.time()
-            
-            if response.status_code == 200:
-                data = response.json()
-                self.p1_agent = Agent("Participant1", "Agent1")
-                self.p1_agent.latency = (end_time - start_time)
-            else:
-                return False
-                
-        except (requests.RequestException, requests.Timeout):
-            return False
+class HttpTransport:
+    """
+    Talks to the player servers over HTTP: every request carries the serialized game.
+    """
+    def __init__(self, p1_url, p2_url, timeout=TIMEOUT):
+        self.urls = {PLAYER1: p1_url, PLAYER2: p2_url}
+        self.timeout = timeout
 
-        # Check P2
+    def check_latency(self, player):
+        """ Seconds the player's server takes to answer, or None if it cannot be reached """
         try:
             start_time = time.time()
-            response = requests.get(self.p2_url, timeout=TIMEOUT)
+            response = requests.get(self.urls[player], timeout=self.timeout)
             end_time = time.time()
-            
             if response.status_code == 200:
                 data = response.json()
-                self.p2_agent = Agent("Participant2", "Agent2")
-                self.p2_agent.latency = (end_time - start_time)
-            else:
-                return False
-                
+                return end_time - start_time
+            return None
         except (requests.RequestException, requests.Timeout):
-            return False
-
-        return True
+            return None
 
-    def start_game(self):
-        """ Start the game for both players """
+    def start(self, game, player, first_turn):
         starting_data = {
-            "game": self.game.to_dict(),
-            "board": self.game.board.tolist(),
-            "max_latency": TIMEOUT,
+            "game": game.to_dict(),
+            "board": game.board.tolist(),
+            "max_latency": self.timeout,
+            "first_turn": first_turn,
         }
-        # Start p1
         try:
-            starting_data['first_turn'] = True
-            response = requests.post(f"{self.p1_url}/start", json=starting_data, timeout=TIMEOUT)
-
+            response = requests.post(f"{self.urls[player]}/start", json=starting_data, timeout=self.timeout)
+            return True
         except (requests.RequestException, requests.Timeout):
             return False
 
-        # Start p2
+    def request_move(self, game, player, attempt_number, random_attempts):
+        """ The move the player's server answers with; raises TransportError if the request fails """
+        move_data = {
+                    "game": game.to_dict(),
+                    "board": game.board.tolist(),
+                    "turn_count": game.turn_count,
+                    "attempt_number": attempt_number,
+                    "random_attempts": random_attempts,
+                }
         try:
-            starting_data['first_turn'] = False
-            response = requests.post(f"{self.p2_url}/start", json=starting_data, timeout=TIMEOUT)
-            return True
+            response = requests.post(f"{self.urls[player]}/move", json=move_data, timeout=self.timeout)
+        except (requests.RequestException, requests.Timeout):
+            raise TransportError()
+        if response.status_code != 200:
+            raise TransportError()
+        return response.json().get('move')
 
+    def end(self, game, winner):
+        end_data = {
+                    "game": game.to_dict(),
+                    "board": game.board.tolist(),
+                    "turn_count": game.turn_count,
+                    "winner": int(winner)
+                }
+        try:
+            for player in (PLAYER1, PLAYER2):
+                response = requests.post(f"{self.urls[player]}/end", json=end_data, timeout=self.timeout)
+            return True
         except (requests.RequestException, requests.Timeout):
             return False
 
-    def receive_move(self, attempt_number, p1_random, p2_random):
-        """ Receive moves from each player """
-        move_data = {
-                    "game": self.game.to_dict(),
-                    "board": self.game.board.tolist(),
-                    "turn_count": self.game.turn_count,
-                    "attempt_number": attempt_number,
-                }
+class LocalTransport:
+    """
+    Calls get_best_move on agent objects in this process, with no serialization.
+
+    An agent gets a copy of the game, as a player server gets one rebuilt from the request. An exception or
+    an answer later than the timeout fails the attempt like a failed HTTP request; the late answer is dropped.
+    Agents with a time_manager are told the attempt number, as the player server does.
+    """
+    def __init__(self, p1_agent, p2_agent, timeout=TIMEOUT):
+        self.agents = {PLAYER1: p1_agent, PLAYER2: p2_agent}
+        self.timeout = timeout
+
+    def check_latency(self, player):
+        return 0.0
+
+    def start(self, game, player, first_turn):
+        return True
+
+    def request_move(self, game, player, attempt_number, random_attempts):
+        agent = self.agents[player]
+        time_manager = getattr(agent, 'time_manager', None)
+        if time_manager is not None:
+            time_manager.set_attempt(attempt_number)
+        start_time = time.time()
         try:
-            if self.game.current_player == PLAYER1:
-                move_data["random_attempts"] = p1_random
-                start_time = time.time()
-                response = requests.post(f"{self.p1_url}/move", json=move_data, timeout=TIMEOUT)
-                end_time = time.time()
-                self.p1_agent.latency = (end_time-start_time)
-            else:
-                move_data["random_attempts"] = p2_random
-                start_time = time.time()
-                response = requests.post(f"{self.p2_url}/move", json=move_data, timeout=TIMEOUT)
-                end_time = time.time()
-                self.p2_agent.latency = (end_time-start_time)
+            move = agent.get_best_move(game.copy())
+        except Exception:
+            raise TransportError()
+        if time.time() - start_time > self.timeout:
+            raise TransportError()
+        return move
+
+    def end(self, game, winner):
+        return True
 
-            # receiving the move
-            if response.status_code == 200:
-                move = response.json()
-                handled_move = self.handle_move(self.game, move['move'])
+RANDOM_MOVES = 5    # Random moves played for a player whose two attempts both fail, before it forfeits
 
-                # if self.handle_move(self.game, move['move']):
-                if handled_move == "forfeit":
-                    return "forfeit"
-                elif handled_move:
-                    return True
-                else:
-                    return False
+# Ways a game ends, returned by Judge.play_game
+LINE = "line"               # A player completed 3 in a row
+FORFEIT = "forfeit"         # A player answered with a malformed or illegal move
+NO_RANDOM = "no_random"     # A player failed both attempts with no random moves left
+TURN_LIMIT = "max_turns"    # Drawn at play_game's max_turns
 
-                # return True
+class Judge:
+    def __init__(self, p1_url=None, p2_url=None, transport=None, verbose=True):
+        self.p1_url = p1_url
+        self.p2_url = p2_url
+        self.transport = transport or HttpTransport(p1_url, p2_url)
+        self.verbose = verbose        # Print every move and the board; off for headless matches
+        self.game = BitboardGame()
+        self.p1_agent = None
+        self.p2_agent = None
+        self.game_str = ""
+        self.changed_squares = None   # Squares changed by the last move, for the incremental winner check
+        self.position_keys = []       # Zobrist key of the position after every move
+        self.position_counts = {}     # How many times each position key has occurred
+        self.p1_random = RANDOM_MOVES # Random moves left for p1 and p2
+        self.p2_random = RANDOM_MOVES
+
+    def log(self, *args):
+        if self.verbose:
+            print(*args)
+
+    def check_latency(self):
+        """Check latency for both players and create their agents"""
+        for player, participant, agent_name in ((PLAYER1, "Participant1", "Agent1"), (PLAYER2, "Participant2", "Agent2")):
+            latency = self.transport.check_latency(player)
+            if latency is None:
+                return False
+            agent = Agent(participant, agent_name)
+            agent.latency = latency
+            if player == PLAYER1:
+                self.p1_agent = agent
             else:
-                return False 
-        except (requests.RequestException, requests.Timeout):
+                self.p2_agent = agent
+        return True
+
+    def start_game(self):
+        """ Start the game for both players """
+        return self.transport.start(self.game, PLAYER1, True) and self.transport.start(self.game, PLAYER2, False)
+
+    def receive_move(self, attempt_number, p1_random, p2_random):
+        """ Receive moves from each player """
+        player = self.game.current_player
+        random_attempts = p1_random if player == PLAYER1 else p2_random
+        start_time = time.time()
+        try:
+            move = self.transport.request_move(self.game, player, attempt_number, random_attempts)
+        except TransportError:
+            return False
+        finally:
+            agent = self.p1_agent if player == PLAYER1 else self.p2_agent
+            if agent is not None:
+                agent.latency = (time.time() - start_time)
+
+        handled_move = self.handle_move(self.game, move)
+        if handled_move == "forfeit":
+            return "forfeit"
+        elif handled_move:
+            return True
+        else:
             return False
 
     def end_game(self, winner):
         """ End the game for both players """
-        end_data = {
-                    "game": self.game.to_dict(),
-                    "board": self.game.board.tolist(),
-                    "turn_count": self.game.turn_count,
-                    "winner": int(winner)
-                }
-        try:
-            response = requests.post(f"{self.p1_url}/end", json=end_data, timeout=TIMEOUT)
-            response = requests.post(f"{self.p2_url}/end", json=end_data, timeout=TIMEOUT)
-            print(f"Winner: {'PLAYER1' if winner == PLAYER1 else 'PLAYER2'}")
-        except (requests.RequestException, requests.Timeout):
+        if not self.transport.end(self.game, winner):
             return False
+        if winner != EMPTY:
+            self.log(f"Winner: {'PLAYER1' if winner == PLAYER1 else 'PLAYER2'}")
+
+    def record_position(self, key):
+        """ Logs the position key and reports repeated positions """
+        self.position_keys.append(key)
+        self.position_counts[key] = self.position_counts.get(key, 0) + 1
+        if self.position_counts[key] > 1:
+            self.log(f"Position {key:016x} repeated ({self.position_counts[key]} times)")
 
     def handle_move(self, game, move):
         """ Places the move if valid and returns True or False """
 
         if not isinstance(move, (list, tuple)) or len(move) < 2:
-                print(f"Invalid move format by Player {'P1' if game.current_player == PLAYER1 else 'P2'}")
+                self.log(f"Invalid move format by Player {'P1' if game.current_player == PLAYER1 else 'P2'}")
                 # return False
                 return "forfeit"
 
         if len(move) != 2 and len(move) != 4:
-            print(f"Invalid move format by Player {'P1' if game.current_player == PLAYER1 else 'P2'}")
+            self.log(f"Invalid move format by Player {'P1' if game.current_player == PLAYER1 else 'P2'}")
             # return False
             return "forfeit"
 
-        chess_move = array_to_chess_notation(move)
-        print(f"{game.current_player}'s move is: {move} or {chess_move}")
-
         try:
             # Convert move elements to integers if they aren't already
             move = [int(x) if isinstance(x, (int, str)) else x for x in move]
 
+            chess_move = array_to_chess_notation(move)
+            self.log(f"{game.current_player}'s move is: {move} or {chess_move}")
+
             if game.turn_count < 17:
                 if game.is_valid_placement(move[0], move[1]):
-                    game.place_checker(move[0], move[1])
+                    self.changed_squares = game.place_checker(move[0], move[1])
                 else:
-                    print(f"Invalid placement by {game.current_player}")
+                    self.log(f"Invalid placement by {game.current_player}")
                     # return False
                     return "forfeit"
             else:
-                if game.is_valid_move(move[0], move[1], move[2], move[3]):
-                    game.move_checker(move[0], move[1], move[2], move[3])
+                if len(move) == 4 and game.is_valid_move(move[0], move[1], move[2], move[3]):
+                    self.changed_squares = game.move_checker(move[0], move[1], move[2], move[3])
                 else:
-                    print(f"Invalid move by {game.current_player}")
+                    self.log(f"Invalid move by {game.current_player}")
                     # return False
                     return "forfeit"
 
             player = 1 if self.game.current_player == 1 else 2
             self.game_str += f"-{chess_move}"
+            self.record_position(game.key)
             return True
-        except (requests.RequestException, requests.Timeout):
-            return False
-            
+        except (TypeError, ValueError):
+            self.log(f"Invalid move format by Player {'P1' if game.current_player == PLAYER1 else 'P2'}")
+            return "forfeit"
+
+    def play_game(self, max_turns=None):
+        """
+        Plays the game to the end with the judge's rules and returns (winner, how it ended).
+        Each turn gets two attempts; a forfeit ends the game at once, and two failed attempts play a
+        random move while the player has random moves left. max_turns (None: no limit) draws a long game.
+        """
+        while max_turns is None or self.game.turn_count < max_turns:
+            self.game.turn_count += 1
+            self.log(f"Turn {self.game.turn_count}")
+
+            # movement
+            self.log("Sending move to:", self.game.current_player)
+
+            # first move attempt
+            self.log("First move attempt")
+            first_attempt = self.receive_move(1, self.p1_random, self.p2_random)
+
+            # checks if the first attempt was a forfeit
+            if first_attempt == "forfeit":
+                return self.forfeit()
+
+            if not first_attempt:
+                self.log("Second move attempt")
+
+                second_attempt = self.receive_move(2, self.p1_random, self.p2_random)
+                if second_attempt == "forfeit":
+                    return self.forfeit()
+
+                # second move attempt
+                if not second_attempt:
+                    # plays a random move
+                    self.log(f"Player {'PLAYER1' if self.game.current_player == PLAYER1 else 'PLAYER2'} failed to make a valid move.")
+
+                    current_random_moves = self.p1_random if self.game.current_player == PLAYER1 else self.p2_random
+
+                    if current_random_moves > 0:
+                        move = RandomAgent(player=self.game.current_player).get_best_move(self.game)
+                        self.handle_move(self.game, move)
+                        # tag that it was random
+                        self.game_str += 'r'
+
+                        if self.game.current_player == PLAYER1:
+                            self.p1_random -= 1
+                            self.log(f"P1 has {self.p1_random} random moves left")
+                        else:
+                            self.p2_random -= 1
+                            self.log(f"P2 has {self.p2_random} random moves left")
+                    else:
+                        # current player forfeits
+                        self.log(f"Player {self.game.current_player} has no random moves left. Forfeiting.")
+                        return self.forfeit(NO_RANDOM)
+
+            if self.verbose:
+                self.game.display_board()
+
+            # check for a winner on the lines the last move touched
+            if self.changed_squares is None:
+                winner = self.game.check_winner()
+            else:
+                winner = self.game.check_winner_at(self.changed_squares)
+            if winner != EMPTY:
+                self.end_game(winner)
+                self.log("Game String:", self.game_str)
+                return winner, LINE
+
+            # swaps player
+            self.game.current_player *= -1
+
+            self.log()
+
+        self.log("Game ended in a draw")
+        self.end_game(EMPTY)
+        return EMPTY, TURN_LIMIT
+
+    def forfeit(self, reason=FORFEIT):
+        """ Ends the game with a loss for the player to move """
+        # indicates forfeit
+        self.game_str += f"-q"
+        winner = PLAYER2 if self.game.current_player == PLAYER1 else PLAYER1
+        self.end_game(winner)
+        self.log("Game String:", self.game_str)
+        return winner, reason
 
 def main():
     # creating judge
@@ -231,108 +358,8 @@ def main():
         print("Failed to start game")
         return
 
-    # random moves left for p1 and p2
-    p1_random = 5
-    p2_random = 5
-        
-    # game loop
-    while True:
-        judge.game.turn_count += 1
-        print(f"Turn {judge.game.turn_count}")
-
-        # movement
-        print("Sending move to:", judge.game.current_player)
-
-        # first move attempt
-        print("First move attempt")
-        first_attempt = judge.receive_move(1, p1_random, p2_random)
-
-        # checks if the first attempt was a forfeit
-        if first_attempt == "forfeit":
-            player = 1 if judge.game.current_player == 1 else 2
-
-            judge.game_str += f"-q"
-
-            winner = 1 if player == 2 else -1
-
-            judge.end_game(winner)
-            print("Game String:", judge.game_str)
-            break
-
-        # if not judge.send_move(1, p1_random, p2_random):
-        if not first_attempt:
-            print("Second move attempt")
-
-            second_attempt = judge.receive_move(2, p1_random, p2_random)
-            if second_attempt == "forfeit":
-                player = 1 if judge.game.current_player == 1 else 2
-                # indicates forfeit
-                judge.game_str += f"-q"
-
-                winner = 1 if player == 2 else -1
-
-                judge.end_game(winner)
-                print("Game String:", judge.game_str)
-                break
-
-            # second move attempt
-            if not second_attempt:
-                # plays a random move
-                print(f"Player {'PLAYER1' if judge.game.current_player == PLAYER1 else 'PLAYER2'} failed to make a valid move.")
-
-                current_random_moves = p1_random if judge.game.current_player == PLAYER1 else p2_random
-                
-                if current_random_moves > 0:
-                    random = RandomAgent(player=judge.game.current_player)
-                    move = random.get_best_move(judge.game)
-                    # judge.handle_move(judge.game, move)
-
-                    move = array_to_chess_notation(move)
-                    judge.handle_move(judge.game, move)
-                    # tag that it was random
-                    judge.game_str += 'r'
-
-                    if judge.game.current_player == PLAYER1:
-                        p1_random -= 1
-                        print(f"P1 has {p1_random} random moves left")
-                    else:
-                        p2_random -= 1
-                        print(f"P2 has {p2_random} random moves left")
-                else:
-                    # current player forfeits
-                    print(f"Player {judge.game.current_player} has no random moves left. Forfeiting.")
-                    if judge.game.current_player == PLAYER1:
-                        judge.end_game(PLAYER2)
-                    else:
-                        judge.end_game(PLAYER1)
-
-                    player = 1 if judge.game.current_player == 1 else 2
-                    # indicates forfeit
-                    judge.game_str += f"-q"
-                    
-                    print("Game String:", judge.game_str)
-                    break
-
-        judge.game.display_board()
-            
-        # check for a winner
-        winner = judge.game.check_winner()
-        if winner != EMPTY:
-            judge.end_game(winner)
-            print("Game String:", judge.game_str)
-            break
-
-        # swaps player
-        judge.game.current_player *= -1
-
-        print()
-
-        # draw after certain number of moves???
-        # if judge.game.total_moves >= 32:
-        #     print("Game ended in a draw")
-        #     judge.end_game(EMPTY)
-        #     break
+    judge.play_game()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,127 @@
+from PushBattle import PLAYER1, BOARD_SIZE, GEOMETRY, MOVE_TUPLES, STAGE_WINS, STAGE_NEAR, threat_squares
+from PushBattle import encode_move, move_is_legal, generate_stages
+
+# Move classes, searched in this order
+TT_MOVE = 0
+WINNING = 1
+BLOCKING = 2
+KILLER = 3
+COUNTER = 4
+QUIET = 5
+
+HISTORY_LIMIT = 1 << 20     # History scores are halved once any of them grows past this
+
+def landing_square(move):
+    """
+    Square index a placement (r, c) or movement (r0, c0, r1, c1) lands on.
+    """
+    return move[-2] * BOARD_SIZE + move[-1]
+
+class MoveOrderer:
+    """
+    Orders moves for alpha-beta: transposition table move, immediate wins, blocks of the
+    opponent's 3-in-a-row squares, killer moves per ply, the counter-move to the previous
+    move, then everything else by history score. History and counter-moves live as long
+    as the orderer, so they carry over between iterations and between turns of one game.
+    """
+    def __init__(self, max_ply=64, killers_per_ply=2):
+        self.max_ply = max_ply
+        self.killers_per_ply = killers_per_ply
+        self.killers = [[] for _ in range(max_ply)]
+        self.history = {}           # move -> accumulated depth^2 of the cutoffs it caused
+        self.countermoves = {}      # (source, landing) of the previous move -> move that refuted it
+
+    # Called at the start of every search; killers are relative to the root so they are dropped
+    def new_search(self):
+        self.killers = [[] for _ in range(self.max_ply)]
+
+    # Returns the moves sorted best-first
+    def order(self, game, moves, tt_move=None, ply=0):
+        own = game.own_bits()
+        opp = game.p2_bits if game.current_player == PLAYER1 else game.p1_bits
+        empty = game.empty_bits()
+        win_squares = threat_squares(own, empty)
+        block_squares = threat_squares(opp, empty)
+        killers = self.killers[ply] if ply < self.max_ply else []
+        counter = self.countermoves.get(self._previous(game))
+        history = self.history
+
+        ranked = []
+        for move in moves:
+            if move == tt_move:
+                ranked.append((TT_MOVE, 0, move))
+                continue
+            landing = GEOMETRY.bits[landing_square(move)]
+            if landing & win_squares and self.is_winning(game, move):
+                ranked.append((WINNING, 0, move))
+            elif landing & block_squares:
+                ranked.append((BLOCKING, -history.get(move, 0), move))
+            elif move in killers:
+                ranked.append((KILLER, killers.index(move), move))
+            elif move == counter:
+                ranked.append((COUNTER, 0, move))
+            else:
+                ranked.append((QUIET, -history.get(move, 0), move))
+        ranked.sort(key=lambda item: (item[0], item[1]))
+        return [move for _, _, move in ranked]
+
+    # Yields the legal moves lazily in the same classes as order(): the TT move, the generator's wins
+    # and blocks, killers and the counter-move, then moves next to a piece and the rest, each by history.
+    # Stages a cutoff makes unnecessary are never generated.
+    def staged(self, game, tt_move=None, ply=0, wins=None):
+        history = self.history
+        yielded = set()
+        if tt_move is not None and move_is_legal(game, encode_move(tt_move)):
+            yielded.add(tt_move)
+            yield tt_move
+        for stage, codes in generate_stages(game, wins):
+            moves = [MOVE_TUPLES[code] for code in codes]
+            if stage == STAGE_NEAR:
+                killers = self.killers[ply] if ply < self.max_ply else []
+                for move in killers + [self.countermoves.get(self._previous(game))]:
+                    if move is not None and move not in yielded and move_is_legal(game, encode_move(move)):
+                        yielded.add(move)
+                        yield move
+            if stage != STAGE_WINS:
+                moves.sort(key=lambda move: -history.get(move, 0))
+            for move in moves:
+                if move not in yielded:
+                    if stage < STAGE_NEAR:
+                        yielded.add(move)
+                    yield move
+
+    # True if playing the move gives the player to move 3 in a row
+    def is_winning(self, game, move):
+        player = game.current_player
+        changed = game.make_move(move)
+        winner = game.check_winner_at(changed, player)
+        game.unmake_move()
+        return winner == player
+
+    # Records a move that caused a beta cutoff at the given depth and ply
+    def record_cutoff(self, game, move, depth, ply):
+        if ply < self.max_ply:
+            killers = self.killers[ply]
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[self.killers_per_ply:]
+        score = self.history.get(move, 0) + depth * depth
+        self.history[move] = score
+        if score > HISTORY_LIMIT:
+            self.age_history()
+        previous = self._previous(game)
+        if previous is not None:
+            self.countermoves[previous] = move
+
+    # Halves every history score so recent cutoffs dominate
+    def age_history(self):
+        self.history = {move: score // 2 for move, score in self.history.items() if score > 1}
+
+    # (source, landing) of the move that led to this position, or None at the root of a fresh game or after a null move
+    def _previous(self, game):
+        if not game.undo_stack:
+            return None
+        landing, source = game.undo_stack[-1][:2]
+        if landing is None:
+            return None
+        return source, landing
@@ -0,0 +1,191 @@
+from PushBattle import BitboardGame, PLAYER1, EMPTY, NUM_PIECES
+from symmetry import canonical_key, transform_move, INVERSE
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+
+# BOOK FILE FORMAT
+# A header (magic, record count) followed by fixed-size little-endian records sorted by (key, move):
+#   key     uint64  canonical_key of the position (symmetric positions share one entry)
+#   move    4 x uint8  move in the canonical position; a placement has NO_SQUARE as its last two bytes
+#   score   int32   search score for the side to move, the latest search that recommended the move
+#   count   uint32  how often the move was recommended by a search or played by the winner of a self-play game
+BOOK_MAGIC = b"PBOOK001"
+HEADER = struct.Struct("<8sQ")
+RECORD = struct.Struct("<Q4BiI")
+NO_SQUARE = 255
+
+def _pack_move(move):
+    return tuple(move) + (NO_SQUARE, NO_SQUARE) if len(move) == 2 else tuple(move)
+
+def _unpack_move(packed):
+    return packed[:2] if packed[2] == NO_SQUARE else packed
+
+class OpeningBook:
+    """
+    Read-only opening book on a memory-mapped file.
+
+    Nothing is parsed when the book is opened; lookup() binary-searches the sorted records in place,
+    so a probe costs O(log n) record reads. Positions are looked up by canonical key and the book move is
+    mapped back through the inverse symmetry, so one entry covers every symmetric copy of a position.
+    """
+    def __init__(self, path, min_count=1):
+        self.path = path
+        self.min_count = min_count      # Moves recommended fewer times than this are not played
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size = HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an opening book")
+        self.hits = 0
+        self.misses = 0
+
+    # Opens the book at path, or returns None if there is no book file
+    @classmethod
+    def open(cls, path, min_count=1):
+        if not path or not os.path.exists(path):
+            return None
+        return cls(path, min_count)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def _record(self, index):
+        key, r0, c0, r1, c1, score, count = RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+        return key, _unpack_move((r0, c0, r1, c1)), score, count
+
+    # (move, score, count) of every book move for the canonical key
+    def entries_for_key(self, key):
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        while low < self.size:
+            record_key, move, score, count = self._record(low)
+            if record_key != key:
+                break
+            entries.append((move, score, count))
+            low += 1
+        return entries
+
+    # Book move for the position, or None to fall back to search
+    def lookup(self, game):
+        key, transform = canonical_key(game)
+        entries = [entry for entry in self.entries_for_key(key) if entry[2] >= self.min_count]
+        if not entries:
+            self.misses += 1
+            return None
+        move, _, _ = max(entries, key=lambda entry: (entry[2], entry[1]))
+        move = transform_move(move, INVERSE[transform])
+        if not self.is_legal(game, move):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return move
+
+    # Guards against key collisions and books built for different rules
+    def is_legal(self, game, move):
+        pieces = game.p1_pieces if game.current_player == PLAYER1 else game.p2_pieces
+        if len(move) == 2:
+            return pieces < NUM_PIECES and game.get(*move) == EMPTY
+        return pieces >= NUM_PIECES and game.get(move[0], move[1]) == game.current_player and game.get(move[2], move[3]) == EMPTY
+
+class BookBuilder:
+    """
+    Collects book moves from searches and self-play games and writes the sorted book file.
+    """
+    def __init__(self):
+        self.records = {}       # (canonical key, canonical move) -> [score, count]
+
+    # Records that a search of the position recommended move with the given score
+    def add_search(self, game, move, score, count=1):
+        key, transform = canonical_key(game)
+        record = self.records.setdefault((key, transform_move(move, transform)), [0, 0])
+        record[0] = int(score)
+        record[1] += count
+
+    # Records the winner's moves of a self-play game; moves are played from a fresh game
+    def add_game(self, moves, winner, max_plies=None):
+        game = BitboardGame()
+        for ply, move in enumerate(moves):
+            if max_plies is not None and ply >= max_plies:
+                break
+            if game.current_player == winner:
+                key, transform = canonical_key(game)
+                record = self.records.setdefault((key, transform_move(move, transform)), [0, 0])
+                record[1] += 1
+            game.make_move(move)
+
+    # Adds the records of an existing book file
+    def merge(self, path):
+        book = OpeningBook(path)
+        for index in range(book.size):
+            key, move, score, count = book._record(index)
+            record = self.records.setdefault((key, move), [score, 0])
+            record[1] += count
+        book.close()
+
+    def write(self, path):
+        records = sorted((key, _pack_move(move), score, count) for (key, move), (score, count) in self.records.items())
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(BOOK_MAGIC, len(records)))
+            for key, move, score, count in records:
+                file.write(RECORD.pack(key, *move, score, count))
+
+def build(path, games, plies, move_time, random_plies=2, merge=True):
+    """
+    Builds a book from self-play. Each game opens with random_plies random placements (seeded by the game
+    number, so every game explores a different line), then both sides search every position of the first
+    plies for move_time seconds (recorded as search results). The game is played out with quicker
+    searches and the winner's opening moves are counted.
+    """
+    from agent import Agent
+    builder = BookBuilder()
+    if merge and os.path.exists(path):
+        builder.merge(path)
+    for number in range(games):
+        rng = random.Random(number)
+        game = BitboardGame()
+        agent = Agent(time_limit=move_time)
+        moves = []
+        winner = EMPTY
+        while winner == EMPTY and len(moves) < 200:
+            if len(moves) < random_plies:
+                move = rng.choice(agent.root_moves(game))
+            else:
+                limit = move_time if len(moves) < plies else move_time / 4
+                move = agent.search(game, limit, limit)
+                if len(moves) < plies and agent.last_search.get("score") is not None:
+                    builder.add_search(game, move, agent.last_search["score"])
+            changed = game.make_move(move)
+            moves.append(move)
+            winner = game.check_winner_at(changed, -game.current_player)
+        builder.add_game(moves, winner, plies)
+        print(f"game {number + 1}/{games}: {len(moves)} plies, winner {winner}")
+    builder.write(path)
+    print(f"wrote {len(builder.records)} records to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the opening book from self-play searches.")
+    parser.add_argument("--out", default="opening_book.bin")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--plies", type=int, default=2 * NUM_PIECES, help="placement plies recorded per game")
+    parser.add_argument("--move-time", type=float, default=10.0, help="search seconds per book position")
+    parser.add_argument("--random-plies", type=int, default=2, help="random placements opening each game")
+    parser.add_argument("--fresh", action="store_true", help="do not merge into an existing book")
+    args = parser.parse_args()
+    start = time.time()
+    build(args.out, args.games, args.plies, args.move_time, args.random_plies, merge=not args.fresh)
+    print(f"done in {time.time() - start:.0f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+from PushBattle import PLAYER1, PLAYER2, EMPTY, legal_moves, decode_move
+from judge_engine import Judge, LocalTransport, TIMEOUT, RANDOM_MOVES
+import argparse
+import csv
+import importlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+MAX_TURNS = 200         # Games still running after this many turns are drawn (the HTTP judge plays on without limit)
+OPENING_PLIES = 2       # Random placements that open every game, so that seeds give different games
+MAX_OPENING_PLIES = 4   # More random placements could complete a line before the agents move
+
+RESULT_FIELDS = ["game", "seed", "a_color", "result", "reason", "turns", "a_random", "b_random", "seconds", "moves"]
+
+def load_agent_class(spec):
+    """
+    The class named by "module:Class", e.g. "agent:Agent" or "random_agent:RandomAgent".
+    """
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+def play_opening(judge, rng, plies):
+    """
+    Plays plies random placements chosen by rng on the judge's game, turn by turn as Judge.play_game would.
+    They are marked o in the game string.
+    """
+    game = judge.game
+    for _ in range(plies):
+        game.turn_count += 1
+        judge.handle_move(game, rng.choice([decode_move(code) for code in legal_moves(game)]))
+        judge.game_str += 'o'
+        game.current_player *= -1
+
+def play_game(task):
+    """
+    Plays one game between two agent classes with the judge in-process and returns its result row.
+    task is (game index, seed, a plays first, (spec, kwargs) of agent A, (spec, kwargs) of agent B,
+    move timeout, max turns, random opening plies); result is 1, 0 or -1 from A's point of view.
+    """
+    index, seed, a_first, a_agent, b_agent, timeout, max_turns, opening_plies = task
+    random.seed(seed)
+    a_player = PLAYER1 if a_first else PLAYER2
+    agents = {}
+    for player, (spec, kwargs) in ((a_player, a_agent), (-a_player, b_agent)):
+        agents[player] = load_agent_class(spec)(player=player, **kwargs)
+    judge = Judge(transport=LocalTransport(agents[PLAYER1], agents[PLAYER2], timeout), verbose=False)
+    # The agents are deterministic, so the seeded opening is what makes game i differ from game j
+    play_opening(judge, random.Random(seed), opening_plies)
+    start_time = time.time()
+    winner, reason = judge.play_game(max_turns)
+
+    for agent in agents.values():
+        if hasattr(agent, "close"):
+            agent.close()
+    random_left = {PLAYER1: judge.p1_random, PLAYER2: judge.p2_random}
+    return {
+        "game": index,
+        "seed": seed,
+        "a_color": "P1" if a_first else "P2",
+        "result": 0 if winner == EMPTY else (1 if winner == a_player else -1),
+        "reason": reason,
+        "turns": judge.game.turn_count,
+        "a_random": RANDOM_MOVES - random_left[a_player],
+        "b_random": RANDOM_MOVES - random_left[-a_player],
+        "seconds": round(time.time() - start_time, 3),
+        "moves": judge.game_str.lstrip("-"),    # the judge's game string; o marks an opening ply, r a random move, q a forfeit
+    }
+
+def elo_difference(wins, draws, losses, z=1.96):
+    """
+    (Elo difference, error bar) of A over B from A's wins, draws and losses; the error bar is the half-width
+    of the z-sigma interval of the score, turned into Elo. Scores of 0 or 1 give an infinite difference.
+    """
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, float('inf')
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = z * math.sqrt(variance / games)
+
+    def elo(p):
+        if p <= 0:
+            return float('-inf')
+        if p >= 1:
+            return float('inf')
+        return -400 * math.log10(1 / p - 1)
+
+    width = elo(min(1.0, score + margin)) - elo(max(0.0, score - margin))
+    return elo(score), width / 2 if math.isfinite(width) else float('inf')
+
+class Tournament:
+    """
+    Plays games between two agents across a process pool, without the judge's HTTP servers.
+
+    Agents are classes imported by "module:Class" and built with player= and their keyword arguments for
+    every game. A plays first in the even games and second in the odd ones, and games 2k and 2k + 1 are both
+    seeded with seed + 2k: the seed picks the opening_plies random placements the game starts from, so each
+    opening is played once with either colour, and seeds the module random state the agents and the judge's
+    random moves use. Each game is
+    adjudicated by Judge.play_game over a LocalTransport, so the judge's rules, retries and random moves
+    apply unchanged.
+    """
+    def __init__(self, a_spec, b_spec, a_kwargs=None, b_kwargs=None, workers=None, seed=0, timeout=TIMEOUT,
+                 max_turns=MAX_TURNS, opening_plies=OPENING_PLIES):
+        if not 0 <= opening_plies <= MAX_OPENING_PLIES:
+            raise ValueError(f"opening_plies must be between 0 and {MAX_OPENING_PLIES}")
+        self.a_agent = (a_spec, a_kwargs or {})
+        self.b_agent = (b_spec, b_kwargs or {})
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.timeout = timeout
+        self.max_turns = max_turns
+        self.opening_plies = opening_plies
+
+    # Plays the games and yields their result rows as they finish
+    def run(self, games):
+        tasks = [(i, self.seed + i - i % 2, i % 2 == 0, self.a_agent, self.b_agent, self.timeout, self.max_turns,
+                  self.opening_plies) for i in range(games)]
+        if self.workers <= 1:
+            for task in tasks:
+                yield play_game(task)
+            return
+        with multiprocessing.get_context().Pool(self.workers) as pool:
+            for row in pool.imap_unordered(play_game, tasks):
+                yield row
+
+def summarize(rows, seconds):
+    """
+    Report lines for the result rows: win/draw/loss of A overall and by colour, the Elo difference and games per second.
+    """
+    lines = []
+    for label, subset in (("total", rows), ("A as P1", [r for r in rows if r["a_color"] == "P1"]),
+                          ("A as P2", [r for r in rows if r["a_color"] == "P2"])):
+        wins = sum(1 for r in subset if r["result"] == 1)
+        draws = sum(1 for r in subset if r["result"] == 0)
+        losses = sum(1 for r in subset if r["result"] == -1)
+        diff, margin = elo_difference(wins, draws, losses)
+        lines.append(f"{label:8} W/D/L {wins}/{draws}/{losses}  Elo {diff + 0.0:+.0f} +/- {margin:.0f}")
+    reasons = {}
+    for r in rows:
+        reasons[r["reason"]] = reasons.get(r["reason"], 0) + 1
+    lines.append("ends     " + ", ".join(f"{reason} {count}" for reason, count in sorted(reasons.items())))
+    # Repeated games carry no extra information; many of them mean the result is less certain than the error bar says
+    lines.append(f"distinct {len(set(r['moves'] for r in rows))} of {len(rows)} games")
+    lines.append(f"{len(rows)} games in {seconds:.1f}s ({len(rows) / max(seconds, 1e-9):.2f} games/s)")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Play two agents against each other without the HTTP judge.")
+    parser.add_argument("--a", default="agent:Agent", help="agent A as module:Class")
+    parser.add_argument("--b", default="random_agent:RandomAgent", help="agent B as module:Class")
+    parser.add_argument("--a-args", default="{}", help="JSON keyword arguments for agent A")
+    parser.add_argument("--b-args", default="{}", help="JSON keyword arguments for agent B")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of games 0 and 1; games 2k and 2k + 1 use seed + 2k")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds per move attempt")
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--opening-plies", type=int, default=OPENING_PLIES,
+                        help=f"random placements opening every game (at most {MAX_OPENING_PLIES})")
+    parser.add_argument("--out", default="tournament.csv", help="one result row per game")
+    args = parser.parse_args()
+
+    tournament = Tournament(args.a, args.b, json.loads(args.a_args), json.loads(args.b_args), args.workers,
+                            args.seed, args.timeout, args.max_turns, args.opening_plies)
+    start = time.time()
+    rows = []
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for row in tournament.run(args.games):
+            writer.writerow(row)
+            rows.append(row)
+    rows.sort(key=lambda r: r["game"])
+    print(f"A = {args.a} {args.a_args}, B = {args.b} {args.b_args}")
+    for line in summarize(rows, time.time() - start):
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -1,159 +1,165 @@
-from PushBattle import Game, PLAYER1, PLAYER2, EMPTY, BOARD_SIZE, NUM_PIECES, _torus
-import copy
+from PushBattle import PLAYER1, PLAYER2, EMPTY, GEOMETRY, iter_bits
+from PushBattle import legal_moves, decode_move
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from move_ordering import MoveOrderer
+from agent import SearchTimeout
 import time
 
 class RandomAgent:
-    def __init__(self, player=PLAYER2, max_depth=4, time_limit=2.0):
+    def __init__(self, player=PLAYER2, max_depth=4, time_limit=2.0, tt_size_mb=16):
         self.player = player
         self.first_move = True
         self.max_depth = max_depth
         self.time_limit = time_limit
+        self.tt = TranspositionTable(size_mb=tt_size_mb)   # Scores are stored from the point of view of the side to move
+        self.orderer = MoveOrderer()                       # Killer, history and counter-move tables for the whole game
+        self.nodes = 0
+        self.depth_nodes = []                              # (depth, nodes searched by that iteration) of every completed iteration
 
     def get_possible_moves(self, game):
-        moves = []
-        center_moves = []
-        current_pieces = game.p2_pieces if game.current_player == PLAYER2 else game.p1_pieces
-        center = BOARD_SIZE // 2
-
-        if current_pieces < NUM_PIECES:
-            for r in range(BOARD_SIZE):
-                for c in range(BOARD_SIZE):
-                    if game.board[r][c] == EMPTY:
-                        move = (r, c)
-                        if abs(r - center) <= 1 and abs(c - center) <= 1:
-                            center_moves.append(move)
-                        else:
-                            moves.append(move)
-            return center_moves + moves
-        else:
-            for r0 in range(BOARD_SIZE):
-                for c0 in range(BOARD_SIZE):
-                    if game.board[r0][c0] == game.current_player:
-                        for r1 in range(BOARD_SIZE):
-                            for c1 in range(BOARD_SIZE):
-                                if game.board[r1][c1] == EMPTY:
-                                    moves.append((r0, c0, r1, c1))
-        return moves
+        return [decode_move(code) for code in legal_moves(game)]
 
     def get_best_move(self, game):
         if self.first_move:
             self.first_move = False
             # Check if the center is occupied before choosing it
-            if game.board[4][4] == EMPTY:
+            if game.get(4, 4) == EMPTY:
                 return (4, 4)
-            else:
-                # If center is taken, pick another optimal position
+            # If center is taken, pick another optimal position; a game that opened with random
+            # placements may have taken that one too, and then the move is searched like any other
+            if game.get(4, 3) == EMPTY:
                 return (4, 3)
 
-        best_move = None
-        best_score = float('-inf')
+        # Scores are from the point of view of the player to move at the root
+        self.player = game.current_player
+        self.tt.new_search()
+        self.orderer.new_search()
+        self.nodes = 0
+        self.depth_nodes = []
+        moves = self.get_possible_moves(game)
+        best_move = moves[0] if moves else None
         start_time = time.time()
+        root_ply = len(game.undo_stack)
         depth = 1
 
         while depth <= self.max_depth and (time.time() - start_time) < self.time_limit:
             current_best_move = None
             current_best_score = float('-inf')
-
-            for move in self.get_possible_moves(game):
-                new_game_state = self.create_game_copy(game)
-                self.apply_move(new_game_state, move)
-                score = self.minimax(new_game_state, depth - 1, False, float('-inf'), float('inf'), start_time)
-
-                if score > current_best_score:
-                    current_best_score = score
-                    current_best_move = move
-
-            if current_best_score > best_score:
-                best_score = current_best_score
+            iteration_nodes = self.nodes
+
+            try:
+                # The first move sets the score to beat; the rest are only probed with a null window above it
+                for move in self.orderer.order(game, moves, self.tt.best_move(game.key), 0):
+                    changed = game.make_move(move)
+                    if current_best_move is None:
+                        score = -self.minimax(game, depth - 1, float('-inf'), float('inf'), start_time, changed, 1)
+                    else:
+                        alpha = current_best_score
+                        score = -self.minimax(game, depth - 1, -alpha - 1, -alpha, start_time, changed, 1)
+                        if score > alpha:
+                            score = -self.minimax(game, depth - 1, float('-inf'), -alpha, start_time, changed, 1)
+                    game.unmake_move()
+
+                    if score > current_best_score:
+                        current_best_score = score
+                        current_best_move = move
+            except SearchTimeout:
+                # Throw the unfinished iteration away and take back the moves it left on the board
+                while len(game.undo_stack) > root_ply:
+                    game.unmake_move()
+                break
+
+            if current_best_move is not None:
                 best_move = current_best_move
+                self.tt.store(game.key, depth, EXACT, current_best_score, current_best_move)
+                self.depth_nodes.append((depth, self.nodes - iteration_nodes))
 
             depth += 1
 
         return best_move
 
-    def minimax(self, game, depth, is_maximizing, alpha, beta, start_time):
+    # Principal variation search in negamax form: scores are from the point of view of the side to move,
+    # and moves after the first are probed with a null window and searched again only if they fail high
+    def minimax(self, game, depth, alpha, beta, start_time, changed=None, ply=0):
         if (time.time() - start_time) >= self.time_limit:
-            return 0
+            raise SearchTimeout()
+        self.nodes += 1
 
-        winner = game.check_winner()
+        # Only the lines through the squares the last move changed can hold a new winner;
+        # the turn has already passed, so the player who moved is -current_player
+        winner = game.check_winner() if changed is None else game.check_winner_at(changed, -game.current_player)
         if depth == 0 or winner != EMPTY:
-            return self.evaluate_move(game)
-
-        if is_maximizing:
-            max_eval = float('-inf')
-            for move in self.get_possible_moves(game):
-                new_game_state = self.create_game_copy(game)
-                self.apply_move(new_game_state, move)
-                eval = self.minimax(new_game_state, depth - 1, False, alpha, beta, start_time)
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
-            return max_eval
-        else:
-            min_eval = float('inf')
-            for move in self.get_possible_moves(game):
-                new_game_state = self.create_game_copy(game)
-                self.apply_move(new_game_state, move)
-                eval = self.minimax(new_game_state, depth - 1, True, alpha, beta, start_time)
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-            return min_eval
-
-    def create_game_copy(self, game):
-        new_game = Game()
-        new_game.board = copy.deepcopy(game.board)
-        new_game.current_player = game.current_player
-        new_game.p1_pieces = game.p1_pieces
-        new_game.p2_pieces = game.p2_pieces
-        return new_game
-
-    def apply_move(self, game, move):
-        if len(move) == 2:
-            r, c = move
-            game.board[r][c] = game.current_player
-            if game.current_player == PLAYER2:
-                game.p2_pieces += 1
+            # evaluate_move scores for PLAYER2
+            return self.evaluate_move(game) * -game.current_player
+
+        entry = self.tt.probe(game.key)
+        tt_move = None
+        if entry is not None:
+            _, entry_depth, flag, score, tt_move, _ = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                elif flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        alpha_orig = alpha
+        best_eval = float('-inf')
+        best_move = None
+        for move in self.orderer.staged(game, tt_move, ply):
+            changed = game.make_move(move)
+            if best_move is None:
+                eval = -self.minimax(game, depth - 1, -beta, -alpha, start_time, changed, ply + 1)
             else:
-                game.p1_pieces += 1
-            game.push_neighbors(r, c)
-        elif len(move) == 4:
-            r0, c0, r1, c1 = move
-            game.board[r0][c0] = EMPTY
-            game.board[r1][c1] = game.current_player
-            game.push_neighbors(r1, c1)
+                eval = -self.minimax(game, depth - 1, -alpha - 1, -alpha, start_time, changed, ply + 1)
+                if alpha < eval < beta:
+                    eval = -self.minimax(game, depth - 1, -beta, -alpha, start_time, changed, ply + 1)
+            game.unmake_move()
+            if eval > best_eval:
+                best_eval = eval
+                best_move = move
+            alpha = max(alpha, eval)
+            if alpha >= beta:
+                self.orderer.record_cutoff(game, move, depth, ply)
+                break
+
+        if best_eval <= alpha_orig:
+            flag = UPPER
+        elif best_eval >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(game.key, depth, flag, best_eval, best_move)
+        return best_eval
 
     def evaluate_move(self, game):
         score = 0
-        center = BOARD_SIZE // 2
-        weights = [[center - max(abs(r - center), abs(c - center)) for c in range(BOARD_SIZE)] for r in range(BOARD_SIZE)]
-
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if game.board[r][c] == PLAYER2:
-                    score += weights[r][c] * 3
-                    if self.is_multiple_winning_lines(game, PLAYER2, r, c):
-                        score += 1500
-                    if self.would_win(game, PLAYER2, r, c):
-                        score += 1000
-                elif game.board[r][c] == PLAYER1:
-                    score -= weights[r][c] * 3
-                    if self.is_multiple_winning_lines(game, PLAYER1, r, c):
-                        score -= 1500
-                    if self.would_win(game, PLAYER1, r, c):
-                        score -= 1000
+        weights = GEOMETRY.weights
+
+        for sq in iter_bits(game.p2_bits):
+            score += weights[sq] * 3
+            if self.is_multiple_winning_lines(game, PLAYER2, sq):
+                score += 1500
+            if self.would_win(game, PLAYER2, sq):
+                score += 1000
+        for sq in iter_bits(game.p1_bits):
+            score -= weights[sq] * 3
+            if self.is_multiple_winning_lines(game, PLAYER1, sq):
+                score -= 1500
+            if self.would_win(game, PLAYER1, sq):
+                score -= 1000
         return score
 
-    def is_multiple_winning_lines(self, game, player, row, col):
+    def is_multiple_winning_lines(self, game, player, sq):
+        bits = game.p1_bits if player == PLAYER1 else game.p2_bits
         winning_lines = 0
-        directions = [(-1, 0), (0, -1), (-1, -1), (-1, 1)]
-        for dr, dc in directions:
+        for window in GEOMETRY.windows[sq]:
             count = 0
-            for i in range(-2, 3):
-                r, c = _torus(row + i * dr, col + i * dc)
-                if game.board[r][c] == player:
+            for w in window:
+                if bits & GEOMETRY.bits[w]:
                     count += 1
                     if count == 3:
                         winning_lines += 1
@@ -162,13 +168,12 @@ class RandomAgent:
                     count = 0
         return winning_lines >= 2
 
-    def would_win(self, game, player, row, col):
-        directions = [(-1, 0), (0, -1), (-1, -1), (-1, 1)]
-        for dr, dc in directions:
+    def would_win(self, game, player, sq):
+        bits = game.p1_bits if player == PLAYER1 else game.p2_bits
+        for window in GEOMETRY.windows[sq]:
             count = 0
-            for i in range(-2, 3):
-                r, c = _torus(row + i * dr, col + i * dc)
-                if game.board[r][c] == player:
+            for w in window:
+                if bits & GEOMETRY.bits[w]:
                     count += 1
                     if count == 3:
                         return True
@@ -0,0 +1,283 @@
+from PushBattle import TorusGeometry, PLAYER1, PLAYER2, EMPTY, iter_bits
+from array import array
+from itertools import combinations
+from math import comb
+import argparse
+import time
+
+# Values for the side to move, 2 bits per position in the packed table
+DRAW = 0
+WIN = 1
+LOSS = 2
+VALUE_NAMES = {DRAW: "draw", WIN: "win", LOSS: "loss"}
+
+def _popcount(bits):
+    return bin(bits).count("1")
+
+class RetrogradeSolver:
+    """
+    Exact win/loss/draw solver for PushBattle on a size x size torus with num_pieces pieces per player.
+
+    Pieces never leave the board, so a position is the two players' piece sets plus the side to move,
+    and the side to move is implied by the piece counts until both players have placed everything.
+    Positions are numbered compactly: a group per (P1 count, P2 count), inside it the combinatorial rank
+    of P1's squares, the rank of P2's squares among the squares P1 leaves free, and the side to move
+    where it is not implied. The solver generates every position's moves once, links them backwards and
+    propagates results from the positions decided by an immediate win: a position is a win if a move
+    reaches a lost position, a loss once every move reaches a won position, and a draw if neither ever
+    happens. The result is kept in a 2-bit-per-position table.
+
+    The rules (placement, movement, pushes in DIRECTIONS order, simultaneous wins going to the mover)
+    are those of BitboardGame on TorusGeometry(size).
+    """
+    def __init__(self, size=4, num_pieces=3):
+        self.size = size
+        self.num_pieces = num_pieces
+        self.geometry = TorusGeometry(size)
+        self.cells = size * size
+        self.full_mask = (1 << self.cells) - 1
+
+        # Position groups, in index order: (p1 count, p2 count) -> (offset, number of sides stored)
+        self.groups = {}
+        offset = 0
+        for n1 in range(num_pieces + 1):
+            for n2 in (n1 - 1, n1):
+                if 0 <= n2 <= num_pieces:
+                    sides = 2 if n1 == n2 == num_pieces else 1
+                    self.groups[(n1, n2)] = (offset, sides)
+                    offset += comb(self.cells, n1) * comb(self.cells - n1, n2) * sides
+        self.num_positions = offset
+        # Colex rank of every set of at most num_pieces squares, by its bits
+        self.ranks = {}
+        for k in range(num_pieces + 1):
+            for rank, squares in enumerate(self._subsets(self.cells, k)):
+                self.ranks[sum(1 << sq for sq in squares)] = rank
+        self.with_line = {bits for bits in self.ranks if any(bits & mask == mask for mask in self.geometry.line_masks)}
+        # (neighbour bit, second neighbour bit, second neighbour) of every push direction, per landing
+        self.push_squares = [[(self.geometry.bits[sq1], self.geometry.bits[sq2], sq2)
+                              for sq1, sq2 in zip(self.geometry.neighbors[landing], self.geometry.second_neighbors[landing])]
+                             for landing in range(self.cells)]
+        self.table = bytearray((self.num_positions + 3) // 4)   # 4 positions per byte
+        self.solved = False
+
+    # Side to move of a position with the given piece counts, or None if either side can be to move
+    def implied_side(self, n1, n2):
+        if n1 == n2 == self.num_pieces:
+            return None
+        return PLAYER1 if n1 == n2 else PLAYER2
+
+    def _unrank(self, rank, k):
+        squares = []
+        for i in range(k, 0, -1):
+            c = i - 1
+            while comb(c + 1, i) <= rank:
+                c += 1
+            squares.append(c)
+            rank -= comb(c, i)
+        return squares[::-1]
+
+    # Compact index of a position
+    def index(self, p1_bits, p2_bits, side):
+        n1, n2 = _popcount(p1_bits), _popcount(p2_bits)
+        offset, sides = self.groups[(n1, n2)]
+        # P2's squares are ranked among the squares not taken by P1
+        free_bits = sum(1 << (sq - _popcount(p1_bits & ((1 << sq) - 1))) for sq in iter_bits(p2_bits))
+        index = self.ranks[p1_bits] * comb(self.cells - n1, n2) + self.ranks[free_bits]
+        if sides == 2:
+            index = index * 2 + (side == PLAYER2)
+        return offset + index
+
+    # (p1_bits, p2_bits, side) of a compact index
+    def position(self, index):
+        for (n1, n2), (offset, sides) in self.groups.items():
+            size = comb(self.cells, n1) * comb(self.cells - n1, n2) * sides
+            if index < offset + size:
+                break
+        index -= offset
+        side = self.implied_side(n1, n2)
+        if sides == 2:
+            index, second = divmod(index, 2)
+            side = PLAYER2 if second else PLAYER1
+        rank1, rank2 = divmod(index, comb(self.cells - n1, n2))
+        p1_bits = sum(1 << sq for sq in self._unrank(rank1, n1))
+        free = [sq for sq in range(self.cells) if not p1_bits >> sq & 1]
+        p2_bits = sum(1 << free[sq] for sq in self._unrank(rank2, n2))
+        return p1_bits, p2_bits, side
+
+    # True if bits, a set of at most num_pieces squares, hold 3 in a row
+    def has_line(self, bits):
+        return bits in self.with_line
+
+    # Legal moves of a position as (source square or None, landing square)
+    def moves(self, p1_bits, p2_bits, side):
+        own = p1_bits if side == PLAYER1 else p2_bits
+        empty = ~(p1_bits | p2_bits) & self.full_mask
+        landings = list(iter_bits(empty))
+        if _popcount(own) < self.num_pieces:
+            return [(None, landing) for landing in landings]
+        return [(source, landing) for source in iter_bits(own) for landing in landings]
+
+    # Plays a move; returns (p1_bits, p2_bits, winner) with the same rules as BitboardGame
+    def play(self, p1_bits, p2_bits, side, source, landing):
+        geometry = self.geometry
+        move_bits = geometry.bits[landing] if source is None else geometry.bits[landing] | geometry.bits[source]
+        if side == PLAYER1:
+            p1_bits ^= move_bits
+        else:
+            p2_bits ^= move_bits
+        changed = [landing]
+        for bit1, bit2, sq2 in self.push_squares[landing]:
+            occupied = p1_bits | p2_bits
+            if occupied & bit1 and not occupied & bit2:
+                if p1_bits & bit1:
+                    p1_bits ^= bit1 | bit2
+                else:
+                    p2_bits ^= bit1 | bit2
+                changed.append(sq2)
+
+        p1_wins = p2_wins = False
+        for sq in changed:
+            for mask in geometry.line_masks_through[sq]:
+                if p1_bits & mask == mask:
+                    p1_wins = True
+                if p2_bits & mask == mask:
+                    p2_wins = True
+        if p1_wins and p2_wins:
+            winner = side
+        elif p1_wins:
+            winner = PLAYER1
+        elif p2_wins:
+            winner = PLAYER2
+        else:
+            winner = EMPTY
+        return p1_bits, p2_bits, winner
+
+    # The k-subsets of range(n) in rank order (colexicographic), each as ascending squares
+    def _subsets(self, n, k):
+        return [subset[::-1] for subset in reversed(list(combinations(range(n - 1, -1, -1), k)))]
+
+    # Every position in index order
+    def _positions(self):
+        for (n1, n2), (offset, sides) in self.groups.items():
+            side_list = [PLAYER1, PLAYER2] if sides == 2 else [self.implied_side(n1, n2)]
+            p2_subsets = self._subsets(self.cells - n1, n2)
+            for p1_squares in self._subsets(self.cells, n1):
+                p1_bits = sum(1 << sq for sq in p1_squares)
+                free = [sq for sq in range(self.cells) if not p1_bits >> sq & 1]
+                for p2_squares in p2_subsets:
+                    p2_bits = sum(1 << free[sq] for sq in p2_squares)
+                    for side in side_list:
+                        yield p1_bits, p2_bits, side
+
+    def solve(self, verbose=False):
+        start = time.time()
+        n = self.num_positions
+        value = bytearray(n)
+        remaining = array('i', bytes(4 * n))   # Moves not yet known to lose, per undecided position
+        edge_offsets = array('q', [0]) * (n + 1)
+        edges = array('i')                      # Children of every position, grouped by parent index
+        queue = []
+
+        # Forward pass: immediate wins, and the children of every other position
+        for index, (p1_bits, p2_bits, side) in enumerate(self._positions()):
+            if not (self.has_line(p1_bits) or self.has_line(p2_bits)):
+                children = []
+                for source, landing in self.moves(p1_bits, p2_bits, side):
+                    child_p1, child_p2, winner = self.play(p1_bits, p2_bits, side, source, landing)
+                    if winner == side:
+                        value[index] = WIN
+                        children = None
+                        break
+                    # A move that completes only the opponent's line loses at once and is left out
+                    if winner == EMPTY:
+                        children.append((child_p1, child_p2))
+                if children is None:
+                    queue.append(index)
+                else:
+                    # Indexed only now, as most positions turn out to have a winning move
+                    edges.extend(self.index(child_p1, child_p2, -side) for child_p1, child_p2 in children)
+                    remaining[index] = len(children)
+                    if not children:
+                        value[index] = LOSS
+                        queue.append(index)
+            edge_offsets[index + 1] = len(edges)
+        if verbose:
+            print(f"{n} positions, {len(edges)} moves generated in {time.time() - start:.1f}s")
+
+        # Reverse the edges so every position lists its parents
+        parent_offsets = array('q', [0]) * (n + 1)
+        for child in edges:
+            parent_offsets[child + 1] += 1
+        for index in range(n):
+            parent_offsets[index + 1] += parent_offsets[index]
+        parents = array('i', bytes(4 * len(edges)))
+        fill = array('q', parent_offsets)
+        for parent in range(n):
+            for i in range(edge_offsets[parent], edge_offsets[parent + 1]):
+                child = edges[i]
+                parents[fill[child]] = parent
+                fill[child] += 1
+        del edges, edge_offsets, fill
+
+        # Backward pass from the decided positions
+        while queue:
+            child = queue.pop()
+            child_value = value[child]
+            for i in range(parent_offsets[child], parent_offsets[child + 1]):
+                parent = parents[i]
+                if value[parent] != DRAW:
+                    continue
+                if child_value == LOSS:
+                    value[parent] = WIN
+                    queue.append(parent)
+                else:
+                    remaining[parent] -= 1
+                    if remaining[parent] == 0:
+                        value[parent] = LOSS
+                        queue.append(parent)
+
+        for index in range(n):
+            if value[index]:
+                self.table[index >> 2] |= value[index] << ((index & 3) * 2)
+        self.solved = True
+        if verbose:
+            print(f"solved in {time.time() - start:.1f}s")
+
+    # Value of the position for the side to move: WIN, LOSS or DRAW
+    def value(self, p1_bits, p2_bits, side):
+        index = self.index(p1_bits, p2_bits, side)
+        return (self.table[index >> 2] >> ((index & 3) * 2)) & 3
+
+    # Number of wins, losses and draws over positions without 3 in a row
+    def counts(self):
+        counts = {DRAW: 0, WIN: 0, LOSS: 0}
+        for index, (p1_bits, p2_bits, side) in enumerate(self._positions()):
+            if not (self.has_line(p1_bits) or self.has_line(p2_bits)):
+                counts[(self.table[index >> 2] >> ((index & 3) * 2)) & 3] += 1
+        return counts
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.table)
+
+    def load(self, path):
+        with open(path, "rb") as file:
+            self.table = bytearray(file.read())
+        self.solved = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve PushBattle exactly on a reduced board.")
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--pieces", type=int, default=3)
+    parser.add_argument("--out", help="file for the packed win/loss/draw table")
+    args = parser.parse_args()
+    solver = RetrogradeSolver(args.size, args.pieces)
+    solver.solve(verbose=True)
+    counts = solver.counts()
+    print(f"wins {counts[WIN]}, losses {counts[LOSS]}, draws {counts[DRAW]}")
+    print(f"start position: {VALUE_NAMES[solver.value(0, 0, PLAYER1)]} for Player1")
+    if args.out:
+        solver.save(args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from PushBattle import PLAYER1, PLAYER2, BOARD_SIZE, BOARD_CELLS, GEOMETRY, ZOBRIST_PIECES, zobrist_key, iter_bits
+
+# SYMMETRIES OF THE TORUS
+# Every wrap-around translation combined with every rotation/reflection maps rows, columns, diagonals and
+# push directions onto each other, so the 512 transforms give strategically identical positions.
+# Transform t = dihedral * BOARD_CELLS + dr * BOARD_SIZE + dc applies the rotation/reflection first.
+NUM_DIHEDRAL = 8
+
+def _dihedral(d, r, c):
+    """
+    Image of (r, c) under rotation/reflection d of the board.
+    """
+    n = BOARD_SIZE - 1
+    return [(r, c), (c, n - r), (n - r, n - c), (n - c, r),
+            (r, n - c), (c, r), (n - r, c), (n - c, n - r)][d]
+
+def _permutation(t):
+    dihedral, shift = divmod(t, BOARD_CELLS)
+    dr, dc = divmod(shift, BOARD_SIZE)
+    permutation = []
+    for r, c in GEOMETRY.coords:
+        r1, c1 = _dihedral(dihedral, r, c)
+        permutation.append(((r1 + dr) % BOARD_SIZE) * BOARD_SIZE + (c1 + dc) % BOARD_SIZE)
+    return permutation
+
+# SYMMETRIES[t][sq] is the square sq is mapped to by transform t
+SYMMETRIES = [_permutation(t) for t in range(NUM_DIHEDRAL * BOARD_CELLS)]
+IDENTITY = 0
+_INDEX = {tuple(permutation): t for t, permutation in enumerate(SYMMETRIES)}
+# INVERSE[t] undoes transform t
+INVERSE = [_INDEX[tuple(sorted(range(BOARD_CELLS), key=permutation.__getitem__))] for permutation in SYMMETRIES]
+# Zobrist codes of a piece on square sq after transform t, so transformed keys need no transformed board
+_SYMMETRY_ZOBRIST = {
+    player: [[ZOBRIST_PIECES[player][permutation[sq]] for sq in range(BOARD_CELLS)] for permutation in SYMMETRIES]
+    for player in (PLAYER1, PLAYER2)
+}
+
+def transform_bits(bits, t):
+    """
+    Bitboard with every set square moved by transform t.
+    """
+    permutation = SYMMETRIES[t]
+    result = 0
+    for sq in iter_bits(bits):
+        result |= GEOMETRY.bits[permutation[sq]]
+    return result
+
+def transform_move(move, t):
+    """
+    Placement (r, c) or movement (r0, c0, r1, c1) moved by transform t.
+    """
+    permutation = SYMMETRIES[t]
+    result = ()
+    for i in range(0, len(move), 2):
+        result += GEOMETRY.coords[permutation[move[i] * BOARD_SIZE + move[i + 1]]]
+    return result
+
+def canonical_key(game):
+    """
+    Smallest Zobrist key over the 512 transforms of the position, and the transform t producing it.
+    Symmetric positions share the key; a move m found for the canonical position is played as
+    transform_move(m, INVERSE[t]) in game.
+    """
+    p1 = list(iter_bits(game.p1_bits))
+    p2 = list(iter_bits(game.p2_bits))
+    best_key, best_t = None, IDENTITY
+    for t in range(len(SYMMETRIES)):
+        zobrist1 = _SYMMETRY_ZOBRIST[PLAYER1][t]
+        zobrist2 = _SYMMETRY_ZOBRIST[PLAYER2][t]
+        board_key = 0
+        for sq in p1:
+            board_key ^= zobrist1[sq]
+        for sq in p2:
+            board_key ^= zobrist2[sq]
+        if best_key is None or board_key < best_key:
+            best_key, best_t = board_key, t
+    return zobrist_key(best_key, game.current_player, game.p1_pieces, game.p2_pieces), best_t
+
+def stabilizer(game):
+    """
+    Transforms that leave the position unchanged.
+    """
+    return [t for t in range(len(SYMMETRIES))
+            if transform_bits(game.p1_bits, t) == game.p1_bits and transform_bits(game.p2_bits, t) == game.p2_bits]
+
+def unique_moves(game, moves):
+    """
+    moves without the ones a symmetry of the position maps onto an earlier move, order kept.
+    """
+    symmetries = stabilizer(game)
+    if len(symmetries) == 1:
+        return list(moves)
+    seen = set()
+    unique = []
+    for move in moves:
+        representative = min(transform_move(move, t) for t in symmetries)
+        if representative not in seen:
+            seen.add(representative)
+            unique.append(move)
+    return unique
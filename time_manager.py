@@ -0,0 +1,82 @@
+from PushBattle import PLAYER1, NUM_PIECES, winning_moves
+import time
+
+class TimeManager:
+    """
+    Turns the judge's max_latency into a time budget for one move.
+
+    The hard limit is max_latency minus a safety margin; the margin grows with the request-handling
+    overhead measured by the player server, so serialization and jitter never push a reply past the
+    judge's timeout. The soft limit (when to stop starting new iterations) is a share of the hard limit
+    that depends on the phase and is raised for critical positions and cut for forced ones. Time the
+    request already spent before the search (parsing, syncing, the book) comes off both limits.
+    """
+    def __init__(self, max_latency=4.0, min_margin=0.3, overhead_factor=3.0,
+                 placement_share=0.9, movement_share=0.7, forced_share=0.05, retry_share=0.5):
+        self.max_latency = max_latency
+        self.min_margin = min_margin                # Margin kept even before any overhead was measured
+        self.overhead_factor = overhead_factor      # Margin is this many times the worst recent overhead
+        self.placement_share = placement_share      # Soft limit share while pieces are still being placed
+        self.movement_share = movement_share        # Soft limit share once every piece is on the board
+        self.forced_share = forced_share            # Soft limit share when the move is forced
+        self.retry_share = retry_share              # Hard limit share on the judge's second attempt
+        self.overheads = []                         # Recent request-handling overheads, in seconds
+        self.attempt_number = 1
+        self.request_start = None                   # When the current request arrived, if the server said so
+
+    # Records how long a request spent outside the limits (replying after the move was chosen)
+    def record_overhead(self, seconds):
+        self.overheads.append(max(0.0, seconds))
+        del self.overheads[:-10]
+
+    # Tells the manager which attempt of the judge's two the current request is
+    def set_attempt(self, attempt_number):
+        self.attempt_number = attempt_number or 1
+
+    # Tells the manager when the current request arrived
+    def start_request(self, start_time=None):
+        self.request_start = time.time() if start_time is None else start_time
+
+    # Seconds of the current request used so far; 0 when no request start was given
+    def elapsed(self):
+        if self.request_start is None:
+            return 0.0
+        return max(0.0, time.time() - self.request_start)
+
+    # Seconds kept back from max_latency
+    def margin(self):
+        worst = max(self.overheads) if self.overheads else 0.0
+        return max(self.min_margin, self.overhead_factor * worst)
+
+    # Hard limit for a search; the search must be finished by then
+    def hard_limit(self):
+        limit = max(0.05, self.max_latency - self.margin())
+        if self.attempt_number > 1:
+            limit *= self.retry_share
+        return limit
+
+    # True when the opponent threatens to win on its next move; an open two alone is on almost every board
+    def is_critical(self, game):
+        return bool(winning_moves(game, -game.current_player, first=True))
+
+    # Returns (soft, hard) limits in seconds from now for the position, less elapsed seconds already used
+    # (default: the time since the request arrived)
+    def allocate(self, game, forced=False, elapsed=None):
+        if elapsed is None:
+            elapsed = self.elapsed()
+        hard = self.hard_limit()
+        if forced:
+            share = self.forced_share
+        else:
+            pieces = game.p1_pieces if game.current_player == PLAYER1 else game.p2_pieces
+            share = self.placement_share if pieces < NUM_PIECES else self.movement_share
+            if self.is_critical(game):
+                share = 1.0
+        left = max(0.05, hard - elapsed)
+        return min(left, max(0.01, hard * share - elapsed)), left
+
+    # Soft limit after an iteration whose score moved by swing; unstable scores get more time
+    def extend(self, soft, hard, swing):
+        if swing > 500:
+            return min(hard, soft * 1.5)
+        return soft
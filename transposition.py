@@ -0,0 +1,64 @@
+# Bound flags stored with every entry
+EXACT = 0   # Score is the exact minimax value
+LOWER = 1   # Search failed high; the true value is at least the score
+UPPER = 2   # Search failed low; the true value is at most the score
+
+ENTRY_BYTES = 128   # Rough size of one stored entry in CPython, used to turn megabytes into slots
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table indexed by the low bits of a Zobrist key.
+    Each slot holds (key, depth, flag, score, move, age). A slot is replaced when it is empty,
+    left over from an older search, or searched no deeper than the new result.
+    """
+    def __init__(self, size_mb=32, entries=None):
+        if entries is None:
+            entries = max(1, (size_mb * 1024 * 1024) // ENTRY_BYTES)
+        # Round down to a power of two so the slot is key & mask
+        self.size = 1 << (entries.bit_length() - 1)
+        self.mask = self.size - 1
+        self.slots = [None] * self.size
+        self.age = 0        # Incremented once per search so stale entries are replaced first
+        self.hits = 0
+        self.stores = 0
+
+    # Starts a new search; entries from earlier searches become replaceable
+    def new_search(self):
+        self.age += 1
+
+    # Empties the table
+    def clear(self):
+        self.slots = [None] * self.size
+        self.age = 0
+        self.hits = 0
+        self.stores = 0
+
+    # Returns the (key, depth, flag, score, move, age) entry for key, or None
+    def probe(self, key):
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    # Returns the best move stored for key, or None
+    def best_move(self, key):
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry[4]
+        return None
+
+    # Stores a search result, subject to the replacement policy
+    def store(self, key, depth, flag, score, move):
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is not None and entry[5] == self.age and entry[1] > depth and entry[0] != key:
+            return
+        if entry is not None and entry[0] == key and move is None:
+            move = entry[4]     # Keep the known best move for this position
+        self.slots[index] = (key, depth, flag, score, move, self.age)
+        self.stores += 1
+
+    # Fraction of slots in use
+    def usage(self):
+        return sum(1 for entry in self.slots if entry is not None) / self.size